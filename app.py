@@ -6,6 +6,9 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from flask_login import LoginManager
 
+from db_routing import RoutingSession, create_replica_tables, init_routing, replica_binds
+from fragment_cache import init_fragment_cache
+
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -15,7 +18,7 @@ class Base(DeclarativeBase):
     pass
 
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 
 # create the app
 app = Flask(__name__)
@@ -31,8 +34,46 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 }
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Each worker fully rebuilds its symptom index this often to pick up other workers' edits
+app.config["RECOMMENDER_REBUILD_SECONDS"] = int(os.environ.get("RECOMMENDER_REBUILD_SECONDS", 300))
+
+# Dynamic responses at least this large are gzip/brotli-compressed on the fly
+app.config["COMPRESS_MIN_SIZE"] = int(os.environ.get("COMPRESS_MIN_SIZE", 2048))
+
+# Rendered template fragments kept per worker, and where compiled templates are cached
+app.config["FRAGMENT_CACHE_SIZE"] = int(os.environ.get("FRAGMENT_CACHE_SIZE", 5000))
+app.config["JINJA_BYTECODE_CACHE_DIR"] = os.environ.get("JINJA_BYTECODE_CACHE_DIR")
+
+# Profiling hooks (?_profile=1 / X-Profile header for admins, background stack sampler)
+app.config["PROFILER_ENABLED"] = os.environ.get("PROFILER_ENABLED", "0") == "1"
+app.config["PROFILER_SAMPLING"] = os.environ.get("PROFILER_SAMPLING", "0") == "1"
+app.config["PROFILER_SAMPLE_INTERVAL"] = float(os.environ.get("PROFILER_SAMPLE_INTERVAL", 0.01))
+app.config["PROFILER_MAX_OVERHEAD"] = float(os.environ.get("PROFILER_MAX_OVERHEAD", 0.01))
+
+# Finished appointments older than this are moved to the archive table
+app.config["APPOINTMENT_ARCHIVE_DAYS"] = int(os.environ.get("APPOINTMENT_ARCHIVE_DAYS", 180))
+
+# Optional read replicas, e.g. DATABASE_REPLICA_URLS="sqlite:///medicare_replica.db"
+app.config["SQLALCHEMY_BINDS"] = replica_binds(os.environ.get("DATABASE_REPLICA_URLS", ""))
+app.config["SQLALCHEMY_REPLICA_PIN_SECONDS"] = int(os.environ.get("DATABASE_REPLICA_PIN_SECONDS", 5))
+
+# Audit events are buffered per worker and bulk-inserted in batches off the request path
+app.config["AUDIT_BUFFER_SIZE"] = int(os.environ.get("AUDIT_BUFFER_SIZE", 10000))
+app.config["AUDIT_BATCH_SIZE"] = int(os.environ.get("AUDIT_BATCH_SIZE", 500))
+app.config["AUDIT_FLUSH_SECONDS"] = float(os.environ.get("AUDIT_FLUSH_SECONDS", 1.0))
+app.config["AUDIT_SPILL_DIR"] = os.environ.get("AUDIT_SPILL_DIR")
+
+# Calendar delta sync only returns changes at least this old, so transactions
+# still committing when a client syncs are not skipped by its next sync token
+app.config["CALENDAR_SYNC_SETTLE_SECONDS"] = int(os.environ.get("CALENDAR_SYNC_SETTLE_SECONDS", 30))
+
+# Async driver URL for the optional ASGI mode (asgi.py); derived from DATABASE_URL when unset
+app.config["ASYNC_DATABASE_URL"] = os.environ.get("ASYNC_DATABASE_URL")
+
 # initialize the app with the extension
 db.init_app(app)
+init_routing(app, db)
+init_fragment_cache(app)
 
 # Setup login manager
 login_manager = LoginManager()
@@ -52,7 +93,25 @@ def load_user(user_id):
 # Import models and routes after app initialization
 import models
 import routes
+import archive
+
+# Append-only audit trail
+from audit import init_audit
+init_audit(app, db)
+
+# Fingerprinted static bundles and response compression
+from assets import init_assets
+init_assets(app)
+
+from profiling import init_profiling
+init_profiling(app)
 
 with app.app_context():
     # Create all database tables
     db.create_all()
+    # SQLite replicas start empty; `flask --app app seed-replicas` copies the primary in
+    create_replica_tables(db)
+
+# Build the symptom recommender index once the tables exist
+from recommender import init_recommender
+init_recommender(app, db)
@@ -0,0 +1,87 @@
+import logging
+from datetime import date, timedelta
+
+import click
+from sqlalchemy import delete, func, insert, select, text
+
+from app import app, db
+from models import Appointment, ArchivedAppointment
+
+ARCHIVABLE_STATUSES = ('Completed', 'Cancelled')
+
+
+def _archive_columns():
+    # Columns shared by both tables, so the hot table can grow without breaking the copy
+    hot = Appointment.__table__.c
+    return [c.name for c in ArchivedAppointment.__table__.c if c.name in hot]
+
+
+def _ensure_partitions(first_year, last_year):
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for year in range(first_year, last_year + 1):
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS appointment_archive_{year} "
+            f"PARTITION OF appointment_archive "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        ))
+
+
+def archive_appointments(older_than_days=None, batch_size=500):
+    """Move finished appointments older than the cutoff into appointment_archive.
+
+    Rows are moved in batches of ``batch_size``, each in its own transaction,
+    so the job never holds long locks on the hot table. Returns the number of
+    rows archived.
+    """
+    if older_than_days is None:
+        older_than_days = app.config['APPOINTMENT_ARCHIVE_DAYS']
+    cutoff = date.today() - timedelta(days=older_than_days)
+
+    # Maintenance work must see the primary, never a lagging replica
+    db.session.info['pin_primary'] = True
+
+    columns = _archive_columns()
+    hot_columns = [Appointment.__table__.c[name] for name in columns]
+    eligible = (Appointment.status.in_(ARCHIVABLE_STATUSES), Appointment.date < cutoff)
+
+    total = 0
+    while True:
+        # Locked so a row can't be reopened between the copy and the delete
+        ids = db.session.execute(
+            select(Appointment.id).where(*eligible).order_by(Appointment.id).limit(batch_size)
+            .with_for_update()
+        ).scalars().all()
+        if not ids:
+            break
+
+        first, last = db.session.execute(
+            select(func.min(Appointment.date), func.max(Appointment.date))
+            .where(Appointment.id.in_(ids))
+        ).one()
+        _ensure_partitions(first.year, last.year)
+
+        # Re-check eligibility in both statements too, in case the lock isn't
+        # available (SQLite) and a row changed since it was picked
+        db.session.execute(
+            insert(ArchivedAppointment.__table__).from_select(
+                columns, select(*hot_columns).where(Appointment.id.in_(ids), *eligible)
+            )
+        )
+        deleted = db.session.execute(
+            delete(Appointment.__table__).where(Appointment.id.in_(ids), *eligible)
+        ).rowcount
+        db.session.commit()
+        total += deleted
+
+    logging.info('Archived %d appointments older than %s', total, cutoff)
+    return total
+
+
+@app.cli.command('archive-appointments')
+@click.option('--days', type=int, default=None, help='Archive finished appointments older than this.')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+def archive_appointments_command(days, batch_size):
+    """Move old completed/cancelled appointments to the archive table."""
+    moved = archive_appointments(older_than_days=days, batch_size=batch_size)
+    click.echo(f'Archived {moved} appointments.')
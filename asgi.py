@@ -0,0 +1,134 @@
+"""Optional ASGI entry point.
+
+Serves the I/O-bound JSON endpoints (/api/chat, /api/recommend and the
+calendar change feed) as async handlers on an async SQLAlchemy engine, and
+mounts the regular Flask app behind them for everything else:
+
+    pip install "sqlalchemy[asyncio]" starlette uvicorn a2wsgi aiosqlite   # asyncpg for Postgres
+    uvicorn asgi:application --workers 4
+
+Flask routes still run in a thread pool exactly as under gunicorn, so slow
+clients on the async endpoints no longer tie up a whole worker.
+"""
+import asyncio
+import contextlib
+import time
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from app import app, db
+from chatbot import get_chatbot_response
+from models import Appointment, Doctor
+from recommender import index, recommend
+from routes import CALENDAR_OWNERS, _changes_payload
+import ical
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+# Relationship each calendar's change summaries read
+CALENDAR_RELATED = {
+    'doctor': Appointment.patient,
+    'patient': Appointment.doctor,
+}
+
+
+def async_database_url():
+    if app.config['ASYNC_DATABASE_URL']:
+        return app.config['ASYNC_DATABASE_URL']
+    # Use the engine's URL, which Flask-SQLAlchemy has already resolved
+    # (relative SQLite paths point into the instance folder)
+    with app.app_context():
+        url = db.engine.url
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+engine = create_async_engine(async_database_url(), **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+Session = async_sessionmaker(engine, expire_on_commit=False)
+_rebuild_lock = asyncio.Lock()
+
+
+async def _refresh_recommender():
+    # Same periodic rebuild as recommender._refresh_if_stale, without blocking the loop
+    if time.monotonic() - index.built_at <= app.config['RECOMMENDER_REBUILD_SECONDS']:
+        return
+    async with _rebuild_lock:
+        if time.monotonic() - index.built_at <= app.config['RECOMMENDER_REBUILD_SECONDS']:
+            return
+        async with Session() as session:
+            doctors = (await session.scalars(select(Doctor))).all()
+        # Tokenising every doctor is CPU work; keep it off the event loop
+        await asyncio.to_thread(index.rebuild, doctors)
+
+
+async def chat_api(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return JSONResponse({'error': 'Request body must be JSON'}, status_code=400)
+    user_message = data.get('message', '') if isinstance(data, dict) else None
+    if not isinstance(user_message, str):
+        return JSONResponse({'error': 'Request body must be a JSON object with a string "message"'},
+                            status_code=400)
+    await _refresh_recommender()
+    return JSONResponse({'response': get_chatbot_response(user_message),
+                         'recommendations': recommend(user_message)})
+
+
+async def recommend_api(request):
+    await _refresh_recommender()
+    return JSONResponse(recommend(request.query_params.get('symptoms', '')))
+
+
+async def calendar_changes(request):
+    kind, token = request.path_params['kind'], request.path_params['token']
+    if kind not in CALENDAR_OWNERS:
+        return JSONResponse({'error': 'Not found'}, status_code=404)
+    since = ical.decode_sync_token(request.query_params.get('since'))
+    if since is None:
+        return JSONResponse({'error': 'Invalid sync token'}, status_code=400)
+
+    model, column = CALENDAR_OWNERS[kind]
+    related = selectinload(CALENDAR_RELATED[kind])
+    limit = ical.CHANGES_PAGE_SIZE
+    async with Session() as session:
+        owner = await session.scalar(select(model).where(model.calendar_token == token))
+        if owner is None:
+            return JSONResponse({'error': 'Not found'}, status_code=404)
+        rows = (await session.scalars(ical.changes_query(column, owner.id, since, limit).options(related))).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if more:
+            rows += (await session.scalars(
+                ical.changes_tail_query(column, owner.id, rows[-1]).options(related))).all()
+    payload = _changes_payload(kind, rows, ical.next_sync_token(rows, request.query_params.get('since')), more)
+    return JSONResponse(payload)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(application):
+    yield
+    await engine.dispose()
+
+
+# Async routes answer first; anything else falls through to Flask
+compressed = [Middleware(GZipMiddleware, minimum_size=app.config['COMPRESS_MIN_SIZE'])]
+application = Starlette(
+    routes=[
+        Route('/api/chat', chat_api, methods=['POST'], middleware=compressed),
+        Route('/api/recommend', recommend_api, middleware=compressed),
+        Route('/calendar/{kind}/{token}/changes', calendar_changes, middleware=compressed),
+        Mount('/', app=WSGIMiddleware(app)),
+    ],
+    lifespan=lifespan,
+)
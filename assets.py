@@ -0,0 +1,227 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import urllib.request
+
+import click
+from flask import abort, request, send_file, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always produced
+    brotli = None
+
+# Third-party files fetched once by `flask assets vendor` so deployments
+# without internet access never depend on a CDN
+VENDOR = {
+    'vendor/bootstrap/css/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+    'vendor/fontawesome/css/all.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+}
+
+# Bundle name -> source files under static/, concatenated in order
+BUNDLES = {
+    'app.css': ['vendor/bootstrap/css/bootstrap.min.css', 'vendor/fontawesome/css/all.min.css', 'css/app.css'],
+    'app.js': ['vendor/bootstrap/js/bootstrap.bundle.min.js'],
+    'chat.js': ['js/chat.js'],
+    'book_appointment.js': ['js/book_appointment.js'],
+}
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+_CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+assets_cli = AppGroup('assets', help='Vendor, bundle and fingerprint static assets.')
+
+
+def _fingerprint(name, data):
+    root, ext = posixpath.splitext(name)
+    return f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _compressible(name):
+    mimetype = mimetypes.guess_type(name)[0] or ''
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def _write(dist, name, data):
+    path = os.path.join(dist, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if _compressible(name):
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+
+
+def _rewrite_css_urls(css, source, static_dir, dist):
+    # Copy fonts/images referenced by a CSS file into dist under fingerprinted
+    # names, and point the bundle (which lives at the dist root) at the copies
+    def replace(match):
+        target = match.group(2)
+        if target.startswith(('data:', 'http:', 'https:', '/', '#')):
+            return match.group(0)
+        path, _, suffix = target.partition('?')
+        path, _, fragment = path.partition('#')
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        full = os.path.join(static_dir, resolved)
+        if not os.path.isfile(full):
+            logging.warning('Asset %s referenced from %s is missing', resolved, source)
+            return match.group(0)
+        with open(full, 'rb') as f:
+            data = f.read()
+        name = _fingerprint(resolved, data)
+        _write(dist, name, data)
+        return f'url({name}{"#" + fragment if fragment else ""})'
+
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def vendor_assets(static_dir):
+    """Download VENDOR files, plus the fonts/images their CSS references."""
+    for name, url in VENDOR.items():
+        path = os.path.join(static_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url) as response:
+            data = response.read()
+        with open(path, 'wb') as f:
+            f.write(data)
+        if not name.endswith('.css'):
+            continue
+        for _, target in _CSS_URL_RE.findall(data.decode('utf-8')):
+            if target.startswith(('data:', 'http:', 'https:', '/', '#')):
+                continue
+            relative = target.split('?')[0].split('#')[0]
+            dest = os.path.normpath(os.path.join(os.path.dirname(path), relative))
+            if os.path.exists(dest):
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            with urllib.request.urlopen(posixpath.join(posixpath.dirname(url), relative)) as response:
+                with open(dest, 'wb') as f:
+                    f.write(response.read())
+
+
+def build_assets(static_dir):
+    """Bundle, fingerprint and precompress every entry in BUNDLES."""
+    dist = os.path.join(static_dir, DIST_DIR)
+    manifest = {}
+    for bundle, sources in BUNDLES.items():
+        missing = [s for s in sources if not os.path.isfile(os.path.join(static_dir, s))]
+        if missing:
+            raise click.ClickException(
+                f'{bundle}: missing {", ".join(missing)} (run `flask assets vendor` first)')
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_dir, source), 'rb') as f:
+                data = f.read()
+            if bundle.endswith('.css'):
+                data = _rewrite_css_urls(data.decode('utf-8'), source, static_dir, dist).encode('utf-8')
+            parts.append(data)
+        data = b'\n'.join(parts)
+        manifest[bundle] = _fingerprint(bundle, data)
+        _write(dist, manifest[bundle], data)
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def _load_manifest(app):
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST)
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+@assets_cli.command('vendor')
+def vendor_command():
+    """Download third-party CSS/JS and fonts into static/vendor."""
+    from flask import current_app
+    vendor_assets(current_app.static_folder)
+    click.echo('Vendored assets into static/vendor.')
+
+
+@assets_cli.command('build')
+def build_command():
+    """Write fingerprinted, precompressed bundles to static/dist."""
+    from flask import current_app
+    for bundle, name in build_assets(current_app.static_folder).items():
+        click.echo(f'{bundle} -> {name}')
+
+
+def _accepted_encodings():
+    return {part.split(';')[0].strip() for part in request.headers.get('Accept-Encoding', '').split(',')}
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=4)
+    return gzip.compress(data, compresslevel=6)
+
+
+def init_assets(app):
+    app.cli.add_command(assets_cli)
+    manifest = _load_manifest(app)
+    dist = os.path.join(app.static_folder, DIST_DIR)
+
+    @app.context_processor
+    def _asset_helpers():
+        def asset_url(bundle):
+            # Fingerprinted bundle when built, otherwise the unbundled source file
+            if bundle in manifest:
+                return url_for('built_asset', filename=manifest[bundle])
+            return url_for('static', filename=BUNDLES[bundle][-1])
+        return {'asset_url': asset_url, 'assets_built': bool(manifest)}
+
+    @app.route('/assets/<path:filename>')
+    def built_asset(filename):
+        path = os.path.normpath(os.path.join(dist, filename))
+        if not path.startswith(dist + os.sep) or not os.path.isfile(path):
+            abort(404)
+
+        # Serve the best precompressed variant the client accepts
+        encoding = None
+        accepted = _accepted_encodings()
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in accepted and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+
+        response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], etag=True, conditional=True)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
+
+    @app.after_request
+    def _compress_response(response):
+        # Compress large dynamic pages (/doctors, doctor_appointments, ...) on the fly
+        if (response.direct_passthrough or response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or not response.mimetype.startswith(('text/html', 'application/json', 'text/csv', 'text/calendar'))):
+            return response
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        accepted = _accepted_encodings()
+        encoding = 'br' if brotli is not None and 'br' in accepted else 'gzip' if 'gzip' in accepted else None
+        response.vary.add('Accept-Encoding')
+        if encoding is None:
+            return response
+        response.set_data(_compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,210 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import has_request_context, request
+from flask_login import current_user, user_logged_in
+from sqlalchemy import insert, inspect, select
+
+from models import AuditEvent
+
+SEGMENT_SUFFIX = '.jsonl'
+
+
+class AuditBuffer:
+    """In-process buffer that writes audit events in batches off the request path.
+
+    ``record`` only appends to a deque; a background thread bulk-inserts
+    whatever has accumulated every ``interval`` seconds, or sooner once
+    ``batch_size`` events are waiting. Memory is bounded by ``max_events``:
+    past that, the buffer is spilled to an append-only JSON-lines segment in
+    ``spill_dir``. Batches the database rejects are spilled the same way, and
+    segments are replayed into the table on a later flush.
+    """
+
+    def __init__(self, max_events=10000, batch_size=500, interval=1.0, spill_dir=None):
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.interval = interval
+        self.spill_dir = spill_dir
+        self.engine = None
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def record(self, event):
+        self._ensure_thread()
+        with self._lock:
+            self._events.append(event)
+            pending = len(self._events)
+            overflow = self._drain() if pending >= self.max_events else None
+        if overflow:
+            # Database can't keep up; keep memory bounded by writing to disk instead
+            self._spill(overflow)
+        elif pending >= self.batch_size:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return list(self._events)
+
+    def flush(self):
+        """Write everything buffered so far. Safe to call from any thread."""
+        with self._flush_lock:
+            with self._lock:
+                events = self._drain()
+            if events:
+                try:
+                    self._insert(events)
+                except Exception:
+                    logging.exception('Audit insert of %d events failed; spilling to disk', len(events))
+                    self._spill(events)
+                    return
+            self._replay_segments()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _drain(self):
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+    def _ensure_thread(self):
+        # Started lazily, and again after a fork, since threads don't survive one
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _insert(self, events):
+        rows = [dict(event, occurred_at=_parse_time(event['occurred_at'])) for event in events]
+        with self.engine.begin() as connection:
+            connection.execute(insert(AuditEvent.__table__), rows)
+
+    def _spill(self, events):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f'segment-{os.getpid()}-{time.time_ns()}{SEGMENT_SUFFIX}')
+        with open(path, 'a') as f:
+            for event in events:
+                f.write(json.dumps(dict(event, occurred_at=str(event['occurred_at']))) + '\n')
+        logging.warning('Spilled %d audit events to %s', len(events), path)
+
+    def _replay_segments(self):
+        if not self.spill_dir or not os.path.isdir(self.spill_dir):
+            return
+        for name in sorted(os.listdir(self.spill_dir)):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            # Renaming claims the segment, so two workers never replay the same file
+            path = os.path.join(self.spill_dir, name)
+            claimed = f'{path}.{os.getpid()}.replaying'
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            with open(claimed) as f:
+                events = [json.loads(line) for line in f if line.strip()]
+            try:
+                for start in range(0, len(events), self.batch_size):
+                    self._insert(events[start:start + self.batch_size])
+            except Exception:
+                logging.exception('Replaying audit segment %s failed; will retry', name)
+                os.rename(claimed, path)
+                return
+            os.remove(claimed)
+
+
+def _parse_time(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+buffer = AuditBuffer()
+
+
+def record(action, entity_type, entity_id, details=None):
+    """Queue an audit event for ``entity_type``/``entity_id`` done by the current user.
+
+    ``details`` is an optional dict stored as JSON alongside the event.
+    """
+    actor = ip_address = None
+    if has_request_context():
+        ip_address = request.remote_addr
+        if current_user.is_authenticated:
+            actor = current_user.get_id()
+    buffer.record({
+        'occurred_at': datetime.utcnow(),
+        'actor': actor,
+        'action': action,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'details': json.dumps(details, default=str) if details else None,
+        'ip_address': ip_address,
+    })
+
+
+def changes(obj):
+    """Pending column changes on ``obj`` as {column: [old, new]}; call before commit."""
+    state = inspect(obj)
+    result = {}
+    for column in state.mapper.column_attrs:
+        if column.key in ('updated_at', 'starts_at', 'ends_at'):
+            continue  # Derived or automatic; not a decision anyone made
+        added, _, deleted = state.attrs[column.key].history
+        if added:
+            result[column.key] = [deleted[0] if deleted else None, added[0]]
+    return result
+
+
+def history(entity_type, entity_id):
+    """All events for one entity, oldest first, including ones not yet flushed."""
+    with buffer.engine.connect() as connection:
+        rows = connection.execute(
+            select(AuditEvent.__table__)
+            .where(AuditEvent.entity_type == entity_type, AuditEvent.entity_id == entity_id)
+            .order_by(AuditEvent.occurred_at, AuditEvent.id)
+        ).mappings().all()
+    events = [dict(row) for row in rows]
+    events += [dict(event) for event in buffer.pending()
+               if event['entity_type'] == entity_type and event['entity_id'] == entity_id]
+    return events
+
+
+def init_audit(app, db):
+    buffer.max_events = app.config['AUDIT_BUFFER_SIZE']
+    buffer.batch_size = app.config['AUDIT_BATCH_SIZE']
+    buffer.interval = app.config['AUDIT_FLUSH_SECONDS']
+    buffer.spill_dir = app.config['AUDIT_SPILL_DIR'] or os.path.join(app.instance_path, 'audit')
+    with app.app_context():
+        # Always the primary: audit rows are writes
+        buffer.engine = db.engine
+    atexit.register(buffer.close)
+
+    @user_logged_in.connect_via(app)
+    def _logged_in(sender, user, **extra):
+        kind = 'doctor' if user.get_id().startswith('doctor_') else 'user'
+        record('login', kind, user.id)
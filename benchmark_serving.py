@@ -0,0 +1,131 @@
+"""Compare concurrent-connection capacity of the WSGI and ASGI deployments.
+
+Starts the app under gunicorn sync workers and under uvicorn (asgi.py) with
+the same number of workers, then opens many concurrent connections against
+/api/chat. Each client is a deliberately slow one that trickles its request
+body out over ``--slow`` seconds, which is what holds a sync worker hostage:
+
+    python benchmark_serving.py --workers 2 --connections 100 --duration 15
+
+Use a database with some doctors in it; the numbers are only meaningful
+relative to each other on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+HOST = '127.0.0.1'
+
+SERVERS = {
+    'wsgi': ['gunicorn', '--workers', '{workers}', '--worker-class', 'sync', '--timeout', '120',
+             '--bind', '{host}:{port}', 'main:app'],
+    'asgi': ['uvicorn', 'asgi:application', '--workers', '{workers}', '--host', '{host}',
+             '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+def _start(mode, workers, port):
+    command = [part.format(workers=workers, host=HOST, port=port) for part in SERVERS[mode]]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f'{mode} server did not start on port {port}')
+
+
+async def _request(port, body, slow, timeout):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        writer.write((f'POST /api/chat HTTP/1.1\r\nHost: {HOST}\r\nContent-Type: application/json\r\n'
+                      f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n').encode())
+        # Slow client: the body arrives in a few pieces spread over `slow` seconds
+        pieces = 4
+        step = -(-len(body) // pieces)
+        for start in range(0, len(body), step):
+            writer.write(body[start:start + step])
+            await writer.drain()
+            await asyncio.sleep(slow / pieces)
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def _client(port, body, slow, timeout, deadline, stats):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await _request(port, body, slow, timeout)
+        except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+            stats['errors'] += 1
+            continue
+        if status == 200:
+            stats['latencies'].append(time.perf_counter() - started)
+        else:
+            stats['errors'] += 1
+
+
+async def _load(port, connections, duration, slow, timeout):
+    body = json.dumps({'message': 'I have chest pain and shortness of breath'}).encode()
+    stats = {'latencies': [], 'errors': 0}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(_client(port, body, slow, timeout, deadline, stats) for _ in range(connections)))
+    return stats
+
+
+def run(mode, args, port):
+    server = _start(mode, args.workers, port)
+    try:
+        stats = asyncio.run(_load(port, args.connections, args.duration, args.slow, args.timeout))
+    finally:
+        server.terminate()
+        server.wait()
+    latencies = sorted(stats['latencies'])
+    done = len(latencies)
+    return {
+        'mode': mode,
+        'requests': done,
+        'rps': done / args.duration,
+        'p50': statistics.median(latencies) * 1000 if latencies else float('nan'),
+        'p99': latencies[int(done * 0.99) - 1] * 1000 if latencies else float('nan'),
+        'errors': stats['errors'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--connections', type=int, default=100, help='Concurrent client connections.')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds of load per mode.')
+    parser.add_argument('--slow', type=float, default=0.5, help='Seconds each client takes to send its body.')
+    parser.add_argument('--timeout', type=float, default=10, help='Give up on a response after this long.')
+    parser.add_argument('--port', type=int, default=8700)
+    args = parser.parse_args()
+
+    modes = ['wsgi', 'asgi'] if args.mode == 'both' else [args.mode]
+    print(f'{args.connections} connections, {args.workers} workers, {args.slow}s slow clients, '
+          f'{args.duration}s per mode')
+    print(f'{"mode":<6}{"requests":>10}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"errors":>8}')
+    for offset, mode in enumerate(modes):
+        result = run(mode, args, args.port + offset)
+        print(f'{result["mode"]:<6}{result["requests"]:>10}{result["rps"]:>10.1f}'
+              f'{result["p50"]:>10.1f}{result["p99"]:>10.1f}{result["errors"]:>8}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,9 +33,10 @@ def get_chatbot_response(message):
     elif re.search(r'(login|sign in|password|forgot)', message):
         return "To log in, use your registered email and password. If you've forgotten your password, please contact our support team."
     
-    # About medical conditions (general response)
-    elif re.search(r'(symptom|pain|fever|cough|cold|headache|migraine)', message):
-        return "I'm not qualified to provide medical advice. If you're experiencing symptoms, please book an appointment with an appropriate specialist."
+    # About medical conditions (suggest specialists from the symptom index)
+    elif re.search(r'(symptom|pain|fever|cough|cold|headache|migraine|rash|itch|ache|dizz|breath)', message):
+        suggestion = _suggest_specialists(message)
+        return "I'm not qualified to provide medical advice. " + (suggestion or "If you're experiencing symptoms, please book an appointment with an appropriate specialist.")
     
     # About COVID-19
     elif re.search(r'(covid|corona|virus|pandemic)', message):
@@ -48,3 +49,17 @@ def get_chatbot_response(message):
     # Default response
     else:
         return "I'm sorry, I didn't understand your query. Could you please rephrase or ask something about appointments, doctors, or our services?"
+
+
+
+def _suggest_specialists(message):
+    from recommender import recommend
+    result = recommend(message)
+    if not result['specialties']:
+        return None
+    specialties = ' or '.join(item['specialty'] for item in result['specialties'][:2])
+    reply = f"Based on what you describe, you may want to see a {specialties}."
+    if result['doctors']:
+        names = ', '.join(doctor['name'] for doctor in result['doctors'])
+        reply += f" Available doctors: {names}."
+    return reply
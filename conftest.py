@@ -0,0 +1,42 @@
+"""
+Point the app at a throwaway database before any test imports it
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+_test_dir = tempfile.mkdtemp(prefix='medicare-tests-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(_test_dir, "medicare.db")}'
+os.environ['DATABASE_REPLICA_URLS'] = ''
+os.environ['AUDIT_SPILL_DIR'] = os.path.join(_test_dir, 'audit')
+os.environ['JINJA_BYTECODE_CACHE_DIR'] = os.path.join(_test_dir, 'jinja_cache')
+
+
+@pytest.fixture
+def fresh_db():
+    """Empty tables and per-process caches for tests that need a blank database."""
+    from app import app, db
+    import audit
+    import reports
+    import waitlist
+    from recommender import index
+
+    audit.buffer.flush()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    waitlist.queues = waitlist.WaitlistQueues()
+    reports._closed_period_cache.clear()
+    index.rebuild([])
+    app.jinja_env.fragment_cache.clear()
+    yield db
+
+
+def pytest_unconfigure(config):
+    # Stop the audit writer before its database goes away
+    if 'audit' in sys.modules:
+        sys.modules['audit'].buffer.close()
+    shutil.rmtree(_test_dir, ignore_errors=True)
@@ -0,0 +1,124 @@
+import random
+import time
+
+import click
+import sqlalchemy as sa
+from flask import g, has_request_context, session as cookie_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND_PREFIX = 'replica_'
+PRIMARY_PIN_KEY = '_db_primary_until'
+
+
+# Session that sends reads to replica engines and everything else to the primary
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+        # Only statements bound to the default (primary) database are eligible
+        engines = self._db.engines
+        if bind is not None or engine is not engines.get(None):
+            return engine
+
+        replicas = list(replica_engines(engines).values())
+        if not replicas or self._needs_primary(clause):
+            return engine
+
+        return random.choice(replicas)
+
+    def _needs_primary(self, clause):
+        # Writes, flushes and anything after a write in this session stay on the primary
+        if self._flushing or self.info.get('pin_primary'):
+            return True
+        if self.new or self.dirty or self.deleted:
+            return True
+        if clause is None:
+            return True
+        if isinstance(clause, sa.Select):
+            return clause._for_update_arg is not None
+        # DML, raw text() statements and anything we can't classify
+        return True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _pin_after_write(session, flush_context):
+    session.info['pin_primary'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _pin_before_statement(orm_execute_state):
+    # session.execute(update(...)) and friends write without ever flushing
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['pin_primary'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if session.info.get('pin_primary') and has_request_context():
+        g.db_wrote = True
+
+
+def replica_binds(urls):
+    """Build SQLALCHEMY_BINDS entries for a comma-separated list of replica URLs."""
+    urls = [url.strip() for url in urls.split(',') if url.strip()]
+    return {f'{REPLICA_BIND_PREFIX}{i}': url for i, url in enumerate(urls)}
+
+
+def replica_engines(engines):
+    return {key: engine for key, engine in engines.items()
+            if key is not None and key.startswith(REPLICA_BIND_PREFIX)}
+
+
+def create_replica_tables(db):
+    """Create the schema on SQLite replicas, which nothing else would.
+
+    Real replicas get their tables (and rows) by replicating the primary and
+    are read-only, so they are left alone.
+    """
+    for engine in replica_engines(db.engines).values():
+        if engine.dialect.name == 'sqlite':
+            db.metadata.create_all(engine)
+
+
+def copy_primary_to_replicas(db):
+    """Overwrite each SQLite replica with a consistent snapshot of the SQLite primary."""
+    primary = db.engines[None]
+    if primary.dialect.name != 'sqlite':
+        raise click.ClickException('Only SQLite replicas can be seeded; use your database\'s replication.')
+    copied = []
+    for key, engine in replica_engines(db.engines).items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        source, target = primary.raw_connection(), engine.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        copied.append(key)
+    return copied
+
+
+def init_routing(app, db):
+    # Keep a user on the primary for a few seconds after they write so the
+    # following page (e.g. my_appointments after booking) sees their change
+    pin_seconds = app.config.setdefault('SQLALCHEMY_REPLICA_PIN_SECONDS', 5)
+
+    @app.before_request
+    def _pin_recent_writer():
+        if cookie_session.get(PRIMARY_PIN_KEY, 0) > time.time():
+            db.session.info['pin_primary'] = True
+
+    @app.after_request
+    def _set_writer_pin(response):
+        if g.pop('db_wrote', False):
+            cookie_session[PRIMARY_PIN_KEY] = time.time() + pin_seconds
+        return response
+
+    @app.cli.command('seed-replicas')
+    def seed_replicas_command():
+        """Copy the SQLite primary into each SQLite read replica."""
+        copied = copy_primary_to_replicas(db)
+        click.echo(f'Seeded {len(copied)} replica(s) from the primary.')
@@ -1,7 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField, DateField, BooleanField, IntegerField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
-from models import User
+from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, ValidationError
 
 class RegistrationForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=20)])
@@ -9,16 +8,6 @@ class RegistrationForm(FlaskForm):
     password = PasswordField('Password', validators=[DataRequired(), Length(min=6)])
     confirm_password = PasswordField('Confirm Password', validators=[DataRequired(), EqualTo('password')])
     submit = SubmitField('Sign Up')
-    
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user:
-            raise ValidationError('Username is already taken. Please choose a different one.')
-    
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user:
-            raise ValidationError('Email is already registered. Please use a different one.')
 
 
 class LoginForm(FlaskForm):
@@ -80,18 +69,6 @@ class DoctorRegistrationForm(FlaskForm):
     availability = StringField('Availability (e.g., Mon-Fri 9AM-5PM)', validators=[DataRequired()])
     description = TextAreaField('Professional Summary')
     submit = SubmitField('Register')
-    
-    def validate_email(self, email):
-        from models import Doctor
-        doctor = Doctor.query.filter_by(email=email.data).first()
-        if doctor:
-            raise ValidationError('Email is already registered. Please use a different one.')
-    
-    def validate_license_number(self, license_number):
-        from models import Doctor
-        doctor = Doctor.query.filter_by(license_number=license_number.data).first()
-        if doctor:
-            raise ValidationError('License number is already registered.')
 
 
 class DoctorProfileForm(FlaskForm):
@@ -116,3 +93,25 @@ class AppointmentStatusForm(FlaskForm):
     ], validators=[DataRequired()])
     notes = TextAreaField('Doctor\'s Notes')
     submit = SubmitField('Update Status')
+
+
+class BulkAppointmentForm(FlaskForm):
+    action = SelectField('Bulk Action', choices=[
+        ('confirm_pending', 'Confirm all pending on date'),
+        ('complete_selected', 'Mark selected as completed'),
+        ('cancel_range', 'Cancel date range (unavailable)')
+    ], validators=[DataRequired()])
+    date = DateField('Date', validators=[Optional()], format='%Y-%m-%d')
+    end_date = DateField('Until', validators=[Optional()], format='%Y-%m-%d')
+    submit = SubmitField('Apply')
+
+
+class WaitlistForm(FlaskForm):
+    start_date = DateField('Earliest Date', validators=[DataRequired()], format='%Y-%m-%d')
+    end_date = DateField('Latest Date', validators=[DataRequired()], format='%Y-%m-%d')
+    symptoms = TextAreaField('Symptoms/Reason for Visit', validators=[DataRequired()])
+    submit = SubmitField('Join Waitlist')
+    
+    def validate_end_date(self, end_date):
+        if self.start_date.data and end_date.data < self.start_date.data:
+            raise ValidationError('Latest date must be on or after the earliest date.')
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """Bounded in-process LRU of rendered template fragments with per-entry TTL."""
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _key_part(value):
+    # Model rows key on their version, so an edited row renders afresh and the
+    # stale entry simply ages out of the LRU
+    table = getattr(value, '__tablename__', None)
+    if table is not None:
+        version = getattr(value, 'updated_at', None) or getattr(value, 'created_at', None)
+        return f'{table}:{value.id}:{version.timestamp() if version else 0}'
+    if isinstance(value, (tuple, list)):
+        return '|'.join(_key_part(part) for part in value)
+    return str(value)
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache key, ttl %}...{% endcache %}`` for rendered fragments.
+
+    ``key`` may be a string, a model row or a tuple mixing both, e.g.
+    ``{% cache ('doctor-card', doctor, current_user.is_authenticated), 3600 %}``.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', args), [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key, ttl, caller):
+        cache = self.environment.fragment_cache
+        key = _key_part(key)
+        value = cache.get(key)
+        if value is None:
+            value = caller()
+            cache.set(key, value, ttl)
+        return Markup(value)
+
+
+def init_fragment_cache(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache.max_entries = app.config['FRAGMENT_CACHE_SIZE']
+
+    # Compiled templates are shared by every worker through the filesystem
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
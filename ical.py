@@ -0,0 +1,156 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app import app, db
+from models import SLOT_DURATION, Appointment
+
+PRODID = '-//Medicare+//Appointments//EN'
+FEED_HISTORY = timedelta(days=30)
+CHANGES_PAGE_SIZE = 500
+
+STATUS_MAP = {
+    'Pending': 'TENTATIVE',
+    'Confirmed': 'CONFIRMED',
+    'Completed': 'CONFIRMED',
+    'Cancelled': 'CANCELLED',
+}
+
+
+def _escape(text):
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    # RFC 5545: lines longer than 75 octets continue on lines starting with a space
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        size = 75 if not parts else 74
+        chunk = data[:size]
+        while True:
+            try:
+                parts.append(chunk.decode('utf-8'))
+                break
+            except UnicodeDecodeError:
+                chunk = chunk[:-1]
+        data = data[len(chunk):]
+    return '\r\n '.join(parts)
+
+
+def _utc(value):
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def slot_start(appointment):
+    # Rows saved before starts_at existed still carry only the display time
+    return appointment.starts_at or Appointment.slot_bounds(appointment.date, appointment.time)[0]
+
+
+def feed_window_start():
+    return datetime.utcnow().date() - FEED_HISTORY
+
+
+def feed_query(column, owner_id):
+    return Appointment.query.filter(column == owner_id, Appointment.date >= feed_window_start())
+
+
+def feed_version(column, owner_id):
+    """Return (etag, last_modified) for a feed without loading its rows."""
+    latest, count = db.session.query(func.max(Appointment.updated_at), func.count(Appointment.id)).filter(
+        column == owner_id, Appointment.date >= feed_window_start()).one()
+    etag = hashlib.sha256(f'{owner_id}:{latest}:{count}:{feed_window_start()}'.encode()).hexdigest()[:32]
+    last_modified = latest.replace(tzinfo=timezone.utc) if latest else None
+    return etag, last_modified
+
+
+def render_calendar(name, appointments, describe):
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ]
+    stamp = _utc(datetime.utcnow())
+    for appointment in appointments:
+        start = slot_start(appointment)
+        updated = appointment.updated_at or appointment.created_at or datetime.utcnow()
+        summary, description = describe(appointment)
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:appointment-{appointment.id}@medicareplus',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART:{start.strftime("%Y%m%dT%H%M%S")}',
+            f'DTEND:{(start + SLOT_DURATION).strftime("%Y%m%dT%H%M%S")}',
+            f'LAST-MODIFIED:{_utc(updated)}',
+            f'SEQUENCE:{int(updated.replace(tzinfo=timezone.utc).timestamp())}',
+            f'STATUS:{STATUS_MAP.get(appointment.status, "TENTATIVE")}',
+            f'SUMMARY:{_escape(summary)}',
+            f'DESCRIPTION:{_escape(description)}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def encode_sync_token(value):
+    # Integer arithmetic: a float timestamp is off by up to a microsecond today
+    return str((value.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)) if value else '0'
+
+
+def decode_sync_token(token):
+    try:
+        micros = int(token or 0)
+    except ValueError:
+        return None
+    return _EPOCH + timedelta(microseconds=micros)
+
+
+def settled_before():
+    # updated_at is stamped at flush, not commit, so a slow transaction can make
+    # an older timestamp visible after newer ones. Only rows older than the
+    # settle window are handed out, so a token never moves past an uncommitted change.
+    return datetime.utcnow() - timedelta(seconds=app.config['CALENDAR_SYNC_SETTLE_SECONDS'])
+
+
+def changes_query(column, owner_id, since, limit):
+    # One row past the page tells the caller whether there is more
+    return select(Appointment).where(
+        column == owner_id, Appointment.updated_at > since, Appointment.updated_at <= settled_before()
+    ).order_by(Appointment.updated_at, Appointment.id).limit(limit + 1)
+
+
+def changes_tail_query(column, owner_id, last):
+    # Bulk updates share one updated_at; never split such a group across pages
+    return select(Appointment).where(
+        column == owner_id, Appointment.updated_at == last.updated_at, Appointment.id > last.id
+    ).order_by(Appointment.id)
+
+
+def next_sync_token(rows, token):
+    return encode_sync_token(rows[-1].updated_at) if rows else token or '0'
+
+
+def changes_since(column, owner_id, token, limit=CHANGES_PAGE_SIZE):
+    """Appointments changed after ``token``, oldest first, plus the next token.
+
+    Changes are returned in ``updated_at`` order in pages of ``limit`` rows,
+    once they are older than CALENDAR_SYNC_SETTLE_SECONDS. Clients repeat the
+    call with the returned token until ``more`` is false.
+    """
+    since = decode_sync_token(token)
+    if since is None:
+        return None
+    rows = db.session.scalars(changes_query(column, owner_id, since, limit)).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if more:
+        rows += db.session.scalars(changes_tail_query(column, owner_id, rows[-1])).all()
+    return rows, next_sync_token(rows, token), more
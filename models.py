@@ -1,14 +1,24 @@
-from datetime import datetime
+import secrets
+from datetime import datetime, timedelta
 from app import db
+from sqlalchemy import DDL, event
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
+SLOT_DURATION = timedelta(minutes=60)  # Every appointment occupies one slot
+
+
+def new_calendar_token():
+    return secrets.token_urlsafe(32)
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
+    calendar_token = db.Column(db.String(64), unique=True, nullable=True, default=new_calendar_token)  # Secret iCal feed URL token
     appointments = db.relationship('Appointment', backref='patient', lazy=True)
     
     def set_password(self, password):
@@ -21,6 +31,23 @@ class User(UserMixin, db.Model):
         return f'<User {self.username}>'
 
 
+class AdminBootstrap(db.Model):
+    """The single row recording which user became admin by signing up first.
+
+    Its primary key is fixed, so of two concurrent first sign-ups only one
+    can insert it (see routes.register). Admins made any other way are
+    unaffected.
+    """
+    __tablename__ = 'admin_bootstrap'
+    __table_args__ = (
+        db.CheckConstraint('id = 1', name='ck_admin_bootstrap_single_row'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)  # No FK: the record outlives the account
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class Doctor(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -37,7 +64,9 @@ class Doctor(UserMixin, db.Model):
     license_number = db.Column(db.String(50), unique=True, nullable=True)
     is_verified = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
+    calendar_token = db.Column(db.String(64), unique=True, nullable=True, default=new_calendar_token)  # Secret iCal feed URL token
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     appointments = db.relationship('Appointment', backref='doctor', lazy=True)
     
     def set_password(self, password):
@@ -62,6 +91,164 @@ class Appointment(db.Model):
     status = db.Column(db.String(20), default='Pending')  # Pending, Confirmed, Cancelled
     symptoms = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    starts_at = db.Column(db.DateTime, nullable=True)  # Derived from date + time on save
+    ends_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Used by the archival job to find finished rows past the cutoff
+        db.Index('ix_appointment_status_date', 'status', 'date'),
+        # Used by the calendar feeds' conditional GET and incremental sync
+        db.Index('ix_appointment_doctor_updated', 'doctor_id', 'updated_at'),
+        db.Index('ix_appointment_user_updated', 'user_id', 'updated_at'),
+        # Patient double-booking checks scan a user's intervals by start time
+        db.Index('ix_appointment_user_interval', 'user_id', 'starts_at', 'ends_at'),
+    )
+    
+    @staticmethod
+    def slot_bounds(date, time):
+        starts_at = datetime.combine(date, datetime.strptime(time, '%I:%M %p').time())
+        return starts_at, starts_at + SLOT_DURATION
+    
+    @classmethod
+    def find_conflict(cls, user_id, starts_at, ends_at, exclude_id=None):
+        """Return one of the user's active appointments overlapping [starts_at, ends_at)."""
+        query = cls.query.filter(
+            cls.user_id == user_id,
+            # Lower bound keeps the index range scan short for long histories
+            cls.starts_at > starts_at - SLOT_DURATION,
+            cls.starts_at < ends_at,
+            cls.ends_at > starts_at,
+            cls.status != 'Cancelled'
+        )
+        if exclude_id is not None:
+            query = query.filter(cls.id != exclude_id)
+        return query.first()
     
     def __repr__(self):
         return f'<Appointment with Dr. {self.doctor.name} on {self.date} at {self.time}>'
+
+
+@event.listens_for(Appointment, 'before_insert')
+@event.listens_for(Appointment, 'before_update')
+def _set_appointment_interval(mapper, connection, target):
+    target.starts_at, target.ends_at = Appointment.slot_bounds(target.date, target.time)
+
+
+# A patient can't hold two active appointments that overlap. Postgres enforces
+# this with an exclusion constraint; SQLite gets triggers doing the same
+# indexed range check as Appointment.find_conflict.
+event.listen(Appointment.__table__, 'before_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+event.listen(Appointment.__table__, 'after_create', DDL(
+    "ALTER TABLE appointment ADD CONSTRAINT appointment_user_no_overlap "
+    "EXCLUDE USING gist (user_id WITH =, tsrange(starts_at, ends_at) WITH &&) "
+    "WHERE (status <> 'Cancelled')"
+).execute_if(dialect='postgresql'))
+
+_SQLITE_OVERLAP_CHECK = f"""
+    WHEN NEW.status != 'Cancelled' AND EXISTS (
+        SELECT 1 FROM appointment
+        WHERE user_id = NEW.user_id
+          AND starts_at > datetime(NEW.starts_at, '-{int(SLOT_DURATION.total_seconds())} seconds')
+          AND starts_at < NEW.ends_at
+          AND ends_at > NEW.starts_at
+          AND status != 'Cancelled'
+          AND id IS NOT NEW.id
+    )
+    BEGIN
+        SELECT RAISE(ABORT, 'appointment overlaps another appointment of this patient');
+    END
+"""
+event.listen(Appointment.__table__, 'after_create', DDL(
+    'CREATE TRIGGER appointment_user_no_overlap_insert BEFORE INSERT ON appointment' + _SQLITE_OVERLAP_CHECK
+).execute_if(dialect='sqlite'))
+event.listen(Appointment.__table__, 'after_create', DDL(
+    'CREATE TRIGGER appointment_user_no_overlap_update BEFORE UPDATE OF status, starts_at, ends_at ON appointment'
+    + _SQLITE_OVERLAP_CHECK
+).execute_if(dialect='sqlite'))
+
+
+
+class WaitlistEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    priority = db.Column(db.Integer, default=0, nullable=False)  # Lower is served first
+    symptoms = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), default='Waiting', nullable=False)  # Waiting, Booked, Left
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointment.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    patient = db.relationship('User', backref=db.backref('waitlist_entries', lazy=True))
+    doctor = db.relationship('Doctor')
+    
+    __table_args__ = (
+        db.Index('ix_waitlist_doctor_status_dates', 'doctor_id', 'status', 'start_date', 'end_date'),
+    )
+    
+    def __repr__(self):
+        return f'<WaitlistEntry {self.user_id} for doctor {self.doctor_id} {self.start_date}..{self.end_date}>'
+
+
+# Completed/cancelled appointments moved out of the hot table by archive.py.
+# On Postgres the table is range-partitioned by date (one partition per year),
+# so the partition key has to be part of the primary key.
+class ArchivedAppointment(db.Model):
+    __tablename__ = 'appointment_archive'
+    __table_args__ = (
+        db.Index('ix_appointment_archive_user_date', 'user_id', 'date'),
+        db.Index('ix_appointment_archive_doctor_date', 'doctor_id', 'date'),
+        {'postgresql_partition_by': 'RANGE (date)'},
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    date = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'), nullable=False)
+    time = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20))
+    symptoms = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    patient = db.relationship('User', viewonly=True)
+    doctor = db.relationship('Doctor', viewonly=True)
+
+    def __repr__(self):
+        return f'<ArchivedAppointment {self.id} on {self.date}>'
+
+
+class AuditEvent(db.Model):
+    """Append-only record of who changed what and when (written by audit.py)."""
+    __tablename__ = 'audit_event'
+    __table_args__ = (
+        # History of a single appointment/doctor/user, newest last
+        db.Index('ix_audit_event_entity', 'entity_type', 'entity_id', 'occurred_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    occurred_at = db.Column(db.DateTime, nullable=False)
+    actor = db.Column(db.String(64), nullable=True)  # Login id, e.g. "3" or "doctor_5"
+    action = db.Column(db.String(64), nullable=False)  # e.g. "appointment.cancelled"
+    entity_type = db.Column(db.String(32), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    details = db.Column(db.Text, nullable=True)  # JSON
+    ip_address = db.Column(db.String(45), nullable=True)
+
+    def __repr__(self):
+        return f'<AuditEvent {self.action} {self.entity_type}:{self.entity_id}>'
+
+
+# Audit rows can be added but never changed or removed
+event.listen(AuditEvent.__table__, 'after_create', DDL(
+    "CREATE FUNCTION audit_event_append_only() RETURNS trigger LANGUAGE plpgsql AS "
+    "$$ BEGIN RAISE EXCEPTION 'audit_event is append-only'; END $$; "
+    "CREATE TRIGGER audit_event_append_only BEFORE UPDATE OR DELETE ON audit_event "
+    "FOR EACH ROW EXECUTE FUNCTION audit_event_append_only()"
+).execute_if(dialect='postgresql'))
+for _operation in ('UPDATE', 'DELETE'):
+    event.listen(AuditEvent.__table__, 'after_create', DDL(
+        f"CREATE TRIGGER audit_event_no_{_operation.lower()} BEFORE {_operation} ON audit_event "
+        f"BEGIN SELECT RAISE(ABORT, 'audit_event is append-only'); END"
+    ).execute_if(dialect='sqlite'))
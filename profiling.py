@@ -0,0 +1,198 @@
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Response, abort, before_render_template, g, has_app_context, request, template_rendered
+from flask_login import current_user, login_required
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+
+
+class SamplingProfiler:
+    """Background thread that samples every thread's stack at an interval.
+
+    Samples are aggregated as collapsed stacks ("a;b;c count"), the input
+    format of flamegraph.pl and speedscope. If taking samples costs more than
+    ``max_overhead`` of wall time, the interval is stretched to stay under it.
+    """
+
+    def __init__(self, interval=0.01, max_overhead=0.01, max_stacks=20000):
+        self.interval = self.base_interval = interval
+        self.max_overhead = max_overhead
+        self.max_stacks = max_stacks
+        self.stacks = Counter()
+        self.samples = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._control_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._control_lock:
+            if self.running:
+                return
+            # Each thread gets its own stop event, so a late stop can't reach a newer thread
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                            name='sampling-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._control_lock:
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = self.dropped = 0
+
+    def _run(self, stop):
+        own_id = threading.get_ident()
+        while not stop.wait(self.interval):
+            started = time.perf_counter()
+            collapsed = [self._collapse(frame) for thread_id, frame in sys._current_frames().items()
+                         if thread_id != own_id]
+            with self._lock:
+                for stack in collapsed:
+                    if stack in self.stacks or len(self.stacks) < self.max_stacks:
+                        self.stacks[stack] += 1
+                    else:
+                        self.dropped += 1
+                self.samples += 1
+            cost = time.perf_counter() - started
+            self.interval = max(self.base_interval, cost / self.max_overhead)
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def collapsed(self):
+        with self._lock:
+            return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common()) + '\n'
+
+
+sampler = SamplingProfiler()
+
+
+def _is_admin():
+    return current_user.is_authenticated and getattr(current_user, 'is_admin', False)
+
+
+def _report(profile, started):
+    total = time.perf_counter() - started
+    sql_time = sum(duration for _, duration in g.profile_sql)
+    template_time = sum(duration for _, duration in g.profile_templates)
+
+    out = io.StringIO()
+    out.write(f'{request.method} {request.full_path}\n')
+    out.write(f'Total {total * 1000:.1f} ms | SQL {sql_time * 1000:.1f} ms in {len(g.profile_sql)} queries'
+              f' | Templates {template_time * 1000:.1f} ms'
+              f' | Python {(total - sql_time - template_time) * 1000:.1f} ms\n\n')
+
+    out.write('== SQL ==\n')
+    for statement, duration in sorted(g.profile_sql, key=lambda item: item[1], reverse=True):
+        out.write(f'{duration * 1000:8.2f} ms  {" ".join(statement.split())[:300]}\n')
+    out.write('\n== Templates ==\n')
+    for name, duration in g.profile_templates:
+        out.write(f'{duration * 1000:8.2f} ms  {name}\n')
+
+    out.write('\n== Call graph (cumulative) ==\n')
+    stats = pstats.Stats(profile, stream=out).strip_dirs().sort_stats('cumulative')
+    stats.print_stats(40)
+    stats.print_callees(15)
+    return out.getvalue()
+
+
+def init_profiling(app):
+    """Register profiling hooks when PROFILER_ENABLED is set.
+
+    With it unset nothing is registered at all, so a disabled profiler costs
+    nothing per request.
+    """
+    if not app.config['PROFILER_ENABLED']:
+        return
+
+    sampler.base_interval = sampler.interval = app.config['PROFILER_SAMPLE_INTERVAL']
+    sampler.max_overhead = app.config['PROFILER_MAX_OVERHEAD']
+    if app.config['PROFILER_SAMPLING']:
+        sampler.start()
+
+    def profiling():
+        return has_app_context() and g.get('profile_started') is not None
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _sql_started(conn, cursor, statement, parameters, context, executemany):
+        if profiling():
+            conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+        if profiling() and conn.info.get('profile_query_start'):
+            g.profile_sql.append((statement, time.perf_counter() - conn.info['profile_query_start'].pop()))
+
+    @before_render_template.connect_via(app)
+    def _template_started(sender, template, context, **extra):
+        if profiling():
+            g.profile_template_start = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def _template_finished(sender, template, context, **extra):
+        if profiling() and g.get('profile_template_start') is not None:
+            g.profile_templates.append((template.name, time.perf_counter() - g.pop('profile_template_start')))
+
+    @app.before_request
+    def _start_request_profile():
+        if PROFILE_PARAM not in request.args and PROFILE_HEADER not in request.headers:
+            return
+        if not _is_admin():
+            return
+        g.profile_sql, g.profile_templates = [], []
+        g.profile = cProfile.Profile()
+        g.profile_started = time.perf_counter()
+        g.profile.enable()
+
+    @app.after_request
+    def _finish_request_profile(response):
+        started = g.pop('profile_started', None)
+        if started is None:
+            return response
+        g.profile.disable()
+        return Response(_report(g.profile, started), mimetype='text/plain')
+
+    @app.route('/admin/profiler/flamegraph', methods=['GET', 'POST'])
+    @login_required
+    def profiler_flamegraph():
+        if not _is_admin():
+            abort(403)
+        if request.method == 'POST':
+            action = request.form.get('action')
+            if action == 'start':
+                sampler.start()
+            elif action == 'stop':
+                sampler.stop()
+            elif action == 'reset':
+                sampler.reset()
+            return Response(f'sampler running={sampler.running}\n', mimetype='text/plain')
+        response = Response(sampler.collapsed(), mimetype='text/plain')
+        response.headers['X-Samples'] = str(sampler.samples)
+        response.headers['X-Dropped-Stacks'] = str(sampler.dropped)
+        return response
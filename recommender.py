@@ -0,0 +1,395 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from operator import itemgetter
+from types import SimpleNamespace
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+# Symptom vocabulary per specialty; doctors inherit the text of their specialty
+SPECIALTY_CORPUS = {
+    'Cardiologist': 'heart chest pain tightness palpitations racing heartbeat irregular heartbeat '
+                    'high blood pressure hypertension shortness of breath breathless swollen ankles '
+                    'dizziness fainting cholesterol',
+    'Pediatrician': 'child baby infant newborn kid toddler fever vaccination growth feeding '
+                    'rash colic ear infection cough cold',
+    'Orthopedic Surgeon': 'bone joint knee hip shoulder back pain neck pain fracture sprain '
+                          'sports injury arthritis stiffness swelling ligament spine',
+    'Dermatologist': 'skin rash itching itchy acne pimples eczema psoriasis hair loss dandruff '
+                     'allergy hives mole pigmentation nail infection',
+    'Neurologist': 'headache migraine seizure epilepsy numbness tingling weakness paralysis '
+                   'memory loss tremor dizziness vertigo nerve stroke',
+    'General Physician': 'fever cold cough flu fatigue tiredness body ache sore throat infection '
+                         'weakness vomiting diarrhea general checkup',
+    'Gastroenterologist': 'stomach pain abdominal pain acidity heartburn indigestion nausea vomiting '
+                          'diarrhea constipation bloating liver jaundice',
+    'Pulmonologist': 'cough breathing difficulty wheezing asthma shortness of breath lung '
+                     'chest congestion sputum',
+    'ENT Specialist': 'ear pain hearing loss throat pain tonsils sinus nose bleed blocked nose '
+                      'snoring voice hoarseness',
+    'Ophthalmologist': 'eye pain vision blurred vision red eyes itchy eyes glasses cataract '
+                       'watering eyes',
+    'Psychiatrist': 'anxiety depression stress insomnia sleep problems panic mood '
+                    'sadness',
+}
+
+STOPWORDS = frozenset(
+    'a an and are am as at be been but by for from have has having i im in is it its me my '
+    'of on or since so some that the this to very was with feel feeling since days weeks '
+    'doctor need want get got'.split()
+)
+
+_TOKEN_RE = re.compile(r'[a-z]+')
+
+
+def stem(token):
+    """Light suffix stripping so word forms meet on one stem.
+
+    "headache"/"headaches" -> "headach", "dizzy"/"dizziness" -> "diz",
+    "itching"/"itchy" -> "itch". The stems needn't be words, only consistent
+    between the corpus and the query.
+    """
+    # Plurals
+    if token.endswith('ies') and len(token) > 5:
+        token = token[:-3]
+    elif token.endswith('s') and not token.endswith(('ss', 'us', 'is')) and len(token) > 3:
+        token = token[:-1]
+    # Derivational endings, repeatedly ("tiredness" -> "tired" -> "tir")
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in ('iness', 'ness', 'ing', 'ed'):
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                token = token[:-len(suffix)]
+                stripped = True
+                break
+    # Trailing "y"/"e", then one letter of a doubled final consonant
+    if token.endswith(('y', 'e')) and len(token) > 3:
+        token = token[:-1]
+    if len(token) > 3 and token[-1] == token[-2] and token[-1] not in 'aeiou':
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [stem(token) for token in _TOKEN_RE.findall((text or '').lower())
+            if token not in STOPWORDS and len(token) >= 3]
+
+
+def _normalized_tf(tokens):
+    counts = Counter(tokens)
+    weights = {term: 1 + math.log(n) for term, n in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {term: w / norm for term, w in weights.items()}
+
+
+def _idf(documents, matching):
+    return math.log((1 + documents) / (1 + matching)) + 1
+
+
+def _score_postings(query, postings, documents, scores):
+    # Sparse mat-vec: walk the postings of the query terms only
+    for term, count in query.items():
+        docs = postings.get(term)
+        if not docs:
+            continue
+        idf = _idf(documents, len(docs))
+        weight = (1 + math.log(count)) * idf * idf
+        for key, doc_weight in docs.items():
+            scores[key] += weight * doc_weight
+
+
+# Doctors per query term considered for ranking, highest description weight first
+POSTINGS_DEPTH = 200
+
+
+class _DoctorTerms:
+    """Description postings and specialty membership for the indexed doctors.
+
+    Published copies are never mutated, so queries can read one without a lock.
+    """
+
+    def __init__(self):
+        self.postings = {}        # term -> {doctor id: weight}
+        self.vectors = {}         # doctor id -> {term: weight}
+        self._impact = {}         # term -> top POSTINGS_DEPTH (doctor id, weight), see prime()
+        self.doctors = {}         # doctor id -> display info
+        self.specialty_of = {}    # doctor id -> canonical specialty
+        self.by_specialty = {}    # canonical specialty -> {doctor id: None}, in insertion order
+
+    def copy_for(self, doctor_id, terms=(), specialty=None):
+        """Copy that may be edited for ``doctor_id``, sharing everything it won't touch."""
+        copy = _DoctorTerms()
+        copy.postings = dict(self.postings)
+        for term in set(terms) | set(self.vectors.get(doctor_id, ())):
+            if term in copy.postings:
+                copy.postings[term] = dict(copy.postings[term])
+        copy.vectors = dict(self.vectors)
+        copy._impact = dict(self._impact)
+        copy.doctors = dict(self.doctors)
+        copy.specialty_of = dict(self.specialty_of)
+        touched = {self.specialty_of.get(doctor_id), specialty}
+        copy.by_specialty = {name: dict(ids) if name in touched else ids
+                             for name, ids in self.by_specialty.items()}
+        return copy
+
+    def prime(self):
+        """Build the impact lists edits have invalidated; call before publishing."""
+        for term, docs in self.postings.items():
+            if term not in self._impact:
+                self._impact[term] = heapq.nlargest(POSTINGS_DEPTH, docs.items(), key=itemgetter(1))
+
+    def top_postings(self, term):
+        return self._impact.get(term, ())
+
+    def remove(self, doctor_id):
+        for term in self.vectors.pop(doctor_id, ()):
+            self._impact.pop(term, None)
+            docs = self.postings[term]
+            docs.pop(doctor_id, None)
+            if not docs:
+                del self.postings[term]
+        self.doctors.pop(doctor_id, None)
+        specialty = self.specialty_of.pop(doctor_id, None)
+        if specialty is not None:
+            self.by_specialty[specialty].pop(doctor_id, None)
+
+    def add(self, doctor, vector, specialty):
+        self.remove(doctor.id)
+        for term, weight in vector.items():
+            self._impact.pop(term, None)
+            self.postings.setdefault(term, {})[doctor.id] = weight
+        self.vectors[doctor.id] = vector
+        self.doctors[doctor.id] = {
+            'id': doctor.id,
+            'name': doctor.name,
+            'specialty': doctor.specialty,
+            'price': doctor.price,
+        }
+        if specialty is not None:
+            self.specialty_of[doctor.id] = specialty
+            self.by_specialty.setdefault(specialty, {})[doctor.id] = None
+
+
+class SymptomIndex:
+    """Sparse TF-IDF index over specialty symptom text and doctor descriptions.
+
+    Queries are scored against the fixed specialty corpus first. A doctor's
+    score is their specialty's score plus the match against their own
+    description, so only doctors whose description matches, and a few from
+    the best specialties, are ever ranked. Descriptions are ranked from each
+    query term's POSTINGS_DEPTH strongest postings, kept sorted per term, so
+    query cost doesn't grow with the number of doctors. Document vectors are
+    L2-normalised term frequencies stored as postings lists, with IDF applied
+    on the query side, so adding or removing one doctor only touches that
+    doctor's postings.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()         # held only to read or swap _doctor_terms
+        self._write_lock = threading.Lock()   # serialises edits and rebuild swaps
+        self._doctor_terms = _DoctorTerms()
+        self._changed_during_rebuild = None  # doctor id -> doctor (None = removed)
+        self.built_at = 0.0
+        self._specialty_postings = defaultdict(dict)   # term -> {specialty: weight}
+        for specialty, text in SPECIALTY_CORPUS.items():
+            for term, weight in _normalized_tf(tokenize(f'{specialty} {text}')).items():
+                self._specialty_postings[term][specialty] = weight
+
+    @staticmethod
+    def _vector(doctor):
+        return _normalized_tf(tokenize(doctor.description))
+
+    def _publish(self, doctor_terms):
+        doctor_terms.prime()
+        with self._lock:
+            self._doctor_terms = doctor_terms
+
+    def update_doctor(self, doctor):
+        if not doctor.is_active:
+            self.remove_doctor(doctor.id)
+            return
+        vector, specialty = self._vector(doctor), _canonical_specialty(doctor.specialty)
+        with self._write_lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[doctor.id] = doctor
+            doctor_terms = self._doctor_terms.copy_for(doctor.id, vector, specialty)
+            doctor_terms.add(doctor, vector, specialty)
+            self._publish(doctor_terms)
+
+    def remove_doctor(self, doctor_id):
+        with self._write_lock:
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild[doctor_id] = None
+            if doctor_id in self._doctor_terms.doctors:
+                doctor_terms = self._doctor_terms.copy_for(doctor_id)
+                doctor_terms.remove(doctor_id)
+                self._publish(doctor_terms)
+
+    def rebuild(self, doctors):
+        """Replace every doctor's postings with ``doctors``.
+
+        The new postings are built off to the side and swapped in at once, so
+        queries never see a half-built doctor set. Doctor changes committed
+        while they were being built are replayed before the swap.
+        """
+        with self._write_lock:
+            self._changed_during_rebuild = {}
+        try:
+            fresh = _DoctorTerms()
+            for doctor in doctors:
+                if doctor.is_active:
+                    fresh.add(doctor, self._vector(doctor), _canonical_specialty(doctor.specialty))
+            fresh.prime()
+        except BaseException:
+            with self._write_lock:
+                self._changed_during_rebuild = None
+            raise
+        with self._write_lock:
+            changed, self._changed_during_rebuild = self._changed_during_rebuild, None
+            for doctor_id, doctor in changed.items():
+                if doctor is None or not doctor.is_active:
+                    fresh.remove(doctor_id)
+                else:
+                    fresh.add(doctor, self._vector(doctor), _canonical_specialty(doctor.specialty))
+            self._publish(fresh)
+            self.built_at = time.monotonic()
+
+    def recommend(self, text, limit=3):
+        """Return ranked specialties and doctors for free-text symptoms."""
+        query = Counter(tokenize(text))
+        # Scoring runs on this snapshot outside the lock; edits publish new ones
+        with self._lock:
+            doctor_terms = self._doctor_terms
+
+        specialty_scores = defaultdict(float)
+        _score_postings(query, self._specialty_postings, len(SPECIALTY_CORPUS), specialty_scores)
+        ranked_specialties = sorted(((name, score) for name, score in specialty_scores.items() if score > 0),
+                                    key=itemgetter(1), reverse=True)
+
+        # Only the strongest description matches per term are ranked, and those
+        # exactly, so a term shared by thousands of descriptions costs no more
+        # than a rare one. Their IDF still counts every description.
+        query_weights = {}
+        for term, count in query.items():
+            matching = len(doctor_terms.postings.get(term, ()))
+            if matching:
+                idf = _idf(len(doctor_terms.vectors), matching)
+                query_weights[term] = (1 + math.log(count)) * idf * idf
+        candidates = {}
+        for term in query_weights:
+            for doctor_id, _ in doctor_terms.top_postings(term):
+                if doctor_id not in candidates:
+                    vector = doctor_terms.vectors[doctor_id]
+                    description = sum(weight * vector.get(t, 0.0) for t, weight in query_weights.items())
+                    specialty = specialty_scores.get(doctor_terms.specialty_of.get(doctor_id), 0.0)
+                    candidates[doctor_id] = description + specialty
+        # Everyone else in a specialty ties on its score, so the first few of
+        # the best specialties are the only other doctors that can place
+        needed = limit
+        for name, score in ranked_specialties:
+            for doctor_id in doctor_terms.by_specialty.get(name, ()):
+                if needed == 0:
+                    break
+                if doctor_id not in candidates:
+                    candidates[doctor_id] = score
+                    needed -= 1
+            if needed == 0:
+                break
+
+        top_doctors = heapq.nlargest(limit, candidates.items(), key=itemgetter(1))
+        return {
+            'specialties': [{'specialty': name, 'score': round(score, 4)}
+                            for name, score in ranked_specialties[:limit]],
+            'doctors': [dict(doctor_terms.doctors[doctor_id], score=round(score, 4))
+                        for doctor_id, score in top_doctors],
+        }
+
+
+def _canonical_specialty(name):
+    # "Cardiology", "cardiologist" and "Orthopedics" should map onto the corpus keys
+    stem = (name or '').lower()[:6]
+    if not stem:
+        return None
+    for specialty in SPECIALTY_CORPUS:
+        if specialty.lower().startswith(stem):
+            return specialty
+    return None
+
+
+index = SymptomIndex()
+
+
+def recommend(text, limit=3):
+    _refresh_if_stale()
+    return index.recommend(text, limit=limit)
+
+
+def build_index():
+    from models import Doctor
+    index.rebuild(Doctor.query.all())
+
+
+_rebuild_lock = threading.Lock()
+
+
+def _rebuild_in_background(app):
+    try:
+        with app.app_context():
+            build_index()
+    finally:
+        _rebuild_lock.release()
+
+
+def _refresh_if_stale():
+    # Other workers may have changed doctors; pick that up with a periodic full
+    # rebuild. It runs in a background thread while requests keep using the
+    # current index, and only one rebuild per worker runs at a time.
+    if not has_app_context():
+        return
+    max_age = current_app.config['RECOMMENDER_REBUILD_SECONDS']
+    if time.monotonic() - index.built_at > max_age and _rebuild_lock.acquire(blocking=False):
+        threading.Thread(target=_rebuild_in_background, args=(current_app._get_current_object(),),
+                         name='recommender-rebuild', daemon=True).start()
+
+
+def init_recommender(app, db):
+    from models import Doctor
+    session_class = db.session.session_factory.class_
+
+    # Changes are snapshotted at flush time and applied only once the transaction commits
+    def _pending(target):
+        return object_session(target).info.setdefault('recommender_changes', {})
+
+    @event.listens_for(Doctor, 'after_insert')
+    @event.listens_for(Doctor, 'after_update')
+    def _doctor_saved(mapper, connection, target):
+        _pending(target)[target.id] = SimpleNamespace(
+            id=target.id, name=target.name, specialty=target.specialty,
+            description=target.description, price=target.price,
+            is_active=target.is_active is not False,
+        )
+
+    @event.listens_for(Doctor, 'after_delete')
+    def _doctor_deleted(mapper, connection, target):
+        _pending(target)[target.id] = None
+
+    @event.listens_for(session_class, 'after_commit')
+    def _apply_changes(session):
+        for doctor_id, doctor in session.info.pop('recommender_changes', {}).items():
+            if doctor is None:
+                index.remove_doctor(doctor_id)
+            else:
+                index.update_doctor(doctor)
+
+    @event.listens_for(session_class, 'after_rollback')
+    def _discard_changes(session):
+        session.info.pop('recommender_changes', None)
+
+    with app.app_context():
+        build_index()
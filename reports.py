@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from sqlalchemy import Integer, case, cast, func, select, union_all
+
+from app import db
+from forms import AppointmentForm
+from models import Appointment, ArchivedAppointment, Doctor
+from signals import appointments_changed
+
+# Appointments that count as earned consultation fees
+BILLABLE_STATUSES = ('Confirmed', 'Completed')
+SLOTS_PER_DAY = len(AppointmentForm.time.kwargs['choices'])
+WEEKDAYS = ('Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat')
+
+# Results for periods that ended before today rarely change, so keep them,
+# keyed on a fingerprint of the rows they were computed from
+_closed_period_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 256
+
+
+@appointments_changed.connect
+def _drop_cached_reports(sender, **extra):
+    # The fingerprint already keeps stale results from being served; dropping
+    # them here frees the LRU for this worker instead of waiting for them to age out
+    with _cache_lock:
+        _closed_period_cache.clear()
+
+
+def _appointments(start, end):
+    # Hot and archived appointments in one relation; each side is range-filtered
+    # before the UNION so both tables can use their date indexes
+    columns = ('doctor_id', 'date', 'time', 'status')
+    hot = select(*(Appointment.__table__.c[c] for c in columns)).where(
+        Appointment.date.between(start, end))
+    archived = select(*(ArchivedAppointment.__table__.c[c] for c in columns)).where(
+        ArchivedAppointment.date.between(start, end))
+    return union_all(hot, archived).subquery('appointments')
+
+
+def _fingerprint(start, end):
+    # Row count and newest updated_at of everything a report reads. Any write to
+    # an appointment in the range (from any worker) or to a doctor changes it;
+    # archived rows are never edited, and archiving itself changes the hot count.
+    appointments = select(func.count(), func.max(Appointment.updated_at)).where(
+        Appointment.date.between(start, end))
+    doctors = select(func.count(), func.max(Doctor.updated_at))
+    return (tuple(db.session.execute(appointments).one()),
+            tuple(db.session.execute(doctors).one()))
+
+
+def _weekday(column):
+    if db.engine.dialect.name == 'postgresql':
+        return cast(func.extract('dow', column), Integer)
+    return cast(func.strftime('%w', column), Integer)
+
+
+def _cancelled(appointments):
+    return func.sum(case((appointments.c.status == 'Cancelled', 1), else_=0))
+
+
+def bookings_per_day(start, end):
+    a = _appointments(start, end)
+    rows = db.session.execute(
+        select(a.c.date, func.count(), _cancelled(a))
+        .group_by(a.c.date).order_by(a.c.date)
+    ).all()
+    return [{'date': day, 'bookings': total, 'cancelled': cancelled}
+            for day, total, cancelled in rows]
+
+
+def bookings_per_specialty(start, end):
+    a = _appointments(start, end)
+    billable = func.sum(case((a.c.status.in_(BILLABLE_STATUSES), Doctor.price), else_=0))
+    rows = db.session.execute(
+        select(Doctor.specialty, func.count(), _cancelled(a), billable)
+        .join(Doctor, Doctor.id == a.c.doctor_id)
+        .group_by(Doctor.specialty).order_by(func.count().desc())
+    ).all()
+    return [{'specialty': specialty, 'bookings': total, 'cancelled': cancelled,
+             'cancellation_rate': round(cancelled / total, 4) if total else 0.0,
+             'revenue': revenue or 0}
+            for specialty, total, cancelled, revenue in rows]
+
+
+def doctor_utilisation(start, end):
+    a = _appointments(start, end)
+    billable = func.sum(case((a.c.status.in_(BILLABLE_STATUSES), 1), else_=0))
+    booked = func.sum(case((a.c.status != 'Cancelled', 1), else_=0))
+    rows = db.session.execute(
+        select(Doctor.id, Doctor.name, Doctor.specialty, Doctor.price,
+               func.count(a.c.doctor_id), booked, _cancelled(a), billable)
+        .outerjoin(a, a.c.doctor_id == Doctor.id)
+        .group_by(Doctor.id, Doctor.name, Doctor.specialty, Doctor.price)
+        .order_by(Doctor.name)
+    ).all()
+    capacity = ((end - start).days + 1) * SLOTS_PER_DAY
+    return [{'doctor_id': doctor_id, 'doctor': name, 'specialty': specialty,
+             'bookings': total, 'cancelled': cancelled or 0,
+             'cancellation_rate': round((cancelled or 0) / total, 4) if total else 0.0,
+             'revenue': (billable or 0) * price,
+             'utilisation': round((booked or 0) / capacity, 4) if capacity else 0.0}
+            for doctor_id, name, specialty, price, total, booked, cancelled, billable in rows]
+
+
+def slot_heatmap(start, end):
+    a = _appointments(start, end)
+    weekday = _weekday(a.c.date).label('weekday')
+    rows = db.session.execute(
+        select(weekday, a.c.time, func.count())
+        .where(a.c.status != 'Cancelled')
+        .group_by(weekday, a.c.time)
+    ).all()
+    slots = [value for value, _ in AppointmentForm.time.kwargs['choices']]
+    grid = {day: dict.fromkeys(slots, 0) for day in WEEKDAYS}
+    for day, slot, count in rows:
+        grid[WEEKDAYS[day]][slot] = grid[WEEKDAYS[day]].get(slot, 0) + count
+    return [dict(weekday=day, **counts) for day, counts in grid.items()]
+
+
+REPORTS = {
+    'daily': bookings_per_day,
+    'specialty': bookings_per_specialty,
+    'doctors': doctor_utilisation,
+    'heatmap': slot_heatmap,
+}
+
+
+def run_report(name, start, end):
+    """Run a named report for an inclusive date range.
+
+    Aggregation is pushed down to the database as GROUP BY queries, so only
+    one row per group crosses the wire however many appointments are in the
+    range. Closed periods (ending before today) are cached in-process until
+    the appointments or doctors they cover change.
+    """
+    compute = REPORTS[name]
+    if end >= date.today():
+        return compute(start, end)
+
+    key = (name, start, end, _fingerprint(start, end))
+    with _cache_lock:
+        if key in _closed_period_cache:
+            _closed_period_cache.move_to_end(key)
+            return _closed_period_cache[key]
+
+    result = compute(start, end)
+    with _cache_lock:
+        _closed_period_cache[key] = result
+        while len(_closed_period_cache) > _CACHE_SIZE:
+            _closed_period_cache.popitem(last=False)
+    return result
@@ -1,13 +1,25 @@
-from flask import render_template, url_for, flash, redirect, request, jsonify, abort
+from flask import render_template, url_for, flash, redirect, request, jsonify, abort, Response
 from flask_login import login_user, current_user, logout_user, login_required
 from app import app, db
-from models import User, Doctor, Appointment
+from models import (User, Doctor, Appointment, ArchivedAppointment, WaitlistEntry, AdminBootstrap,
+                    new_calendar_token)
 from forms import (RegistrationForm, LoginForm, AppointmentForm, ChatbotForm, DoctorForm, 
                    CancelAppointmentForm, DoctorLoginForm, DoctorRegistrationForm, 
-                   DoctorProfileForm, AppointmentStatusForm)
+                   DoctorProfileForm, AppointmentStatusForm, BulkAppointmentForm, WaitlistForm)
 from werkzeug.security import generate_password_hash
+from sqlalchemy import exists, select, update
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 from chatbot import get_chatbot_response
+from recommender import recommend
+from reports import REPORTS, run_report
+import audit
+import ical
+import waitlist
+from signals import appointments_changed
+import csv
+import io
+import json
 import logging
 
 # Home route
@@ -15,6 +27,33 @@ import logging
 def index():
     return render_template('index.html', title='Home')
 
+def _unique_field_error(form, error, table, messages):
+    """Attach a unique-constraint violation to the form field it came from.
+
+    Registration relies on the database's unique constraints instead of
+    SELECTing for duplicates first. ``messages`` maps column names to field
+    errors; returns False when the violation isn't one of them.
+    """
+    # SQLite names "table.column", Postgres reports "Key (column)=(...)" and
+    # MySQL "Duplicate entry '...' for key '[table.]column'" (key named after the column)
+    detail = str(error.orig)
+    for column, message in messages.items():
+        if (f'{table}.{column}' in detail or f'({column})=' in detail
+                or f"for key '{column}'" in detail or f"for key '{table}.{column}'" in detail):
+            getattr(form, column).errors.append(message)
+            return True
+    return False
+
+def _claim_admin_bootstrap(user):
+    # Under READ COMMITTED two first sign-ups can both see an empty user
+    # table; only one can insert the single bootstrap row, the other stays a
+    # regular user
+    try:
+        with db.session.begin_nested():
+            db.session.add(AdminBootstrap(id=1, user_id=user.id))
+    except IntegrityError:
+        user.is_admin = False
+
 # Registration route
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -26,14 +65,26 @@ def register():
         user = User(username=form.username.data, email=form.email.data)
         user.set_password(form.password.data)
         
-        # First user becomes admin
-        if User.query.count() == 0:
-            user.is_admin = True
-            
+        # First user becomes admin. The check runs inside the INSERT itself, so
+        # there is no separate count query racing other sign-ups
+        user.is_admin = ~exists().where(User.id.isnot(None))
+        
         db.session.add(user)
-        db.session.commit()
-        flash('Your account has been created! You can now log in.', 'success')
-        return redirect(url_for('login'))
+        try:
+            db.session.flush()
+            if user.is_admin:
+                _claim_admin_bootstrap(user)
+            db.session.commit()
+        except IntegrityError as error:
+            db.session.rollback()
+            if not _unique_field_error(form, error, 'user', {
+                'username': 'Username is already taken. Please choose a different one.',
+                'email': 'Email is already registered. Please use a different one.',
+            }):
+                raise
+        else:
+            flash('Your account has been created! You can now log in.', 'success')
+            return redirect(url_for('login'))
     
     return render_template('register.html', title='Register', form=form)
 
@@ -48,6 +99,7 @@ def login():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
             login_user(user, remember=form.remember.data)
+            _issue_calendar_token(user)
             next_page = request.args.get('next')
             flash('Login successful!', 'success')
             return redirect(next_page) if next_page else redirect(url_for('index'))
@@ -76,16 +128,27 @@ def book_appointment(doctor_id):
     doctor = Doctor.query.get_or_404(doctor_id)
     form = AppointmentForm()
     
+    waitlist_form = WaitlistForm(formdata=None)
+    
     if form.validate_on_submit():
-        # Check if appointment already exists
-        existing_appointment = Appointment.query.filter_by(
-            doctor_id=doctor_id,
-            date=form.date.data,
-            time=form.time.data
+        # Check if appointment already exists (a cancelled booking frees its slot)
+        existing_appointment = Appointment.query.filter(
+            Appointment.doctor_id == doctor_id,
+            Appointment.date == form.date.data,
+            Appointment.time == form.time.data,
+            Appointment.status != 'Cancelled'
         ).first()
         
+        # Check the patient isn't already seeing another doctor at that time
+        starts_at, ends_at = Appointment.slot_bounds(form.date.data, form.time.data)
+        conflict = Appointment.find_conflict(current_user.id, starts_at, ends_at)
+        
         if existing_appointment:
-            flash('This appointment slot is already booked. Please select another time.', 'danger')
+            flash('This appointment slot is already booked. Please select another time, or join the waitlist to get the next free slot.', 'danger')
+            waitlist_form.start_date.data = waitlist_form.end_date.data = form.date.data
+            waitlist_form.symptoms.data = form.symptoms.data
+        elif conflict:
+            flash(f'You already have an appointment with Dr. {conflict.doctor.name} at {conflict.time} on that day. Please select another time.', 'danger')
         else:
             appointment = Appointment(
                 user_id=current_user.id,
@@ -96,20 +159,79 @@ def book_appointment(doctor_id):
                 status='Pending'
             )
             db.session.add(appointment)
-            db.session.commit()
-            flash(f'Appointment booked with Dr. {doctor.name} on {appointment.date} at {appointment.time}', 'success')
-            return redirect(url_for('my_appointments'))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent booking won the race; the database constraint rejected this one
+                db.session.rollback()
+                flash('You already have an appointment at that time. Please select another time.', 'danger')
+            else:
+                flash(f'Appointment booked with Dr. {doctor.name} on {appointment.date} at {appointment.time}', 'success')
+                return redirect(url_for('my_appointments'))
+    
+    return render_template('book_appointment.html', title='Book Appointment', form=form, doctor=doctor,
+                           waitlist_form=waitlist_form)
+
+# Waitlist routes
+@app.route('/waitlist/join/<int:doctor_id>', methods=['POST'])
+@login_required
+def join_waitlist(doctor_id):
+    doctor = Doctor.query.get_or_404(doctor_id)
+    form = WaitlistForm()
     
-    return render_template('book_appointment.html', title='Book Appointment', form=form, doctor=doctor)
+    if form.validate_on_submit():
+        entry = WaitlistEntry(
+            user_id=current_user.id,
+            doctor_id=doctor.id,
+            start_date=form.start_date.data,
+            end_date=form.end_date.data,
+            symptoms=form.symptoms.data
+        )
+        db.session.add(entry)
+        db.session.commit()
+        flash(f'You are on the waitlist for Dr. {doctor.name}. We will book the first slot that frees up.', 'success')
+        return redirect(url_for('my_appointments'))
+    
+    for errors in form.errors.values():
+        for error in errors:
+            flash(error, 'danger')
+    return redirect(url_for('book_appointment', doctor_id=doctor.id))
+
+@app.route('/waitlist/<int:entry_id>/leave', methods=['POST'])
+@login_required
+def leave_waitlist(entry_id):
+    entry = WaitlistEntry.query.get_or_404(entry_id)
+    
+    if entry.user_id != current_user.id:
+        abort(403)  # Forbidden
+    
+    if entry.status == 'Waiting':
+        entry.status = 'Left'
+        db.session.commit()
+    flash('You have left the waitlist.', 'info')
+    return redirect(url_for('my_appointments'))
 
 # My appointments route
 @app.route('/my_appointments')
 @login_required
 def my_appointments():
     appointments = Appointment.query.filter_by(user_id=current_user.id).order_by(Appointment.date.desc()).all()
+    
+    # Older finished appointments live in the archive and are only loaded on request
+    show_history = request.args.get('history', type=int) == 1
+    if show_history:
+        appointments += ArchivedAppointment.query.filter_by(user_id=current_user.id).order_by(ArchivedAppointment.date.desc()).all()
+    
     today = datetime.now().date()
+    waiting = WaitlistEntry.query.filter(
+        WaitlistEntry.user_id == current_user.id,
+        WaitlistEntry.status == 'Waiting',
+        WaitlistEntry.end_date >= today
+    ).order_by(WaitlistEntry.start_date).all()
     cancel_form = CancelAppointmentForm()
-    return render_template('my_appointments.html', title='My Appointments', appointments=appointments, today=today, form=cancel_form)
+    return render_template('my_appointments.html', title='My Appointments', appointments=appointments, today=today, form=cancel_form,
+                           show_history=show_history, calendar_url=_calendar_url(current_user, 'patient'),
+                           waitlist_entries=waiting)
 
 # Cancel appointment route
 @app.route('/cancel_appointment/<int:appointment_id>', methods=['POST'])
@@ -120,8 +242,31 @@ def cancel_appointment(appointment_id):
     if appointment.user_id != current_user.id:
         abort(403)  # Forbidden
     
-    appointment.status = 'Cancelled'
+    previous_status = appointment.status
+    if previous_status not in ('Pending', 'Confirmed') or appointment.date < datetime.now().date():
+        flash('Only upcoming pending or confirmed appointments can be cancelled.', 'warning')
+        return redirect(url_for('my_appointments'))
+    
+    # Conditional UPDATE, so a repeated or concurrent POST can't free (and refill) the slot twice
+    cancelled = db.session.execute(
+        update(Appointment)
+        .where(Appointment.id == appointment.id, Appointment.status.in_(('Pending', 'Confirmed')))
+        .values(status='Cancelled')
+    ).rowcount
+    if not cancelled:
+        db.session.rollback()
+        flash('This appointment has already been cancelled.', 'info')
+        return redirect(url_for('my_appointments'))
+    
+    # Hand the freed slot to the next waiter in the same transaction
+    refilled = waitlist.fill_slot(appointment)
     db.session.commit()
+    audit.record('appointment.cancelled', 'appointment', appointment.id, {'previous_status': previous_status})
+    if refilled:
+        audit.record('appointment.booked_from_waitlist', 'appointment', refilled.id,
+                     {'patient_id': refilled.user_id, 'freed_by': appointment.id})
+    appointments_changed.send('cancel_appointment', doctor_id=appointment.doctor_id,
+                              status='Cancelled', count=1)
     flash('Your appointment has been cancelled.', 'info')
     return redirect(url_for('my_appointments'))
 
@@ -137,7 +282,13 @@ def chat_api():
     data = request.json
     user_message = data.get('message', '')
     response = get_chatbot_response(user_message)
-    return jsonify({"response": response})
+    return jsonify({"response": response, "recommendations": recommend(user_message)})
+
+# Symptom-to-specialist recommendations (used by the booking page)
+@app.route('/api/recommend')
+def recommend_api():
+    symptoms = request.args.get('symptoms', '')
+    return jsonify(recommend(symptoms))
 
 # Admin routes
 @app.route('/admin/dashboard')
@@ -157,6 +308,50 @@ def admin_dashboard():
                           total_appointments=total_appointments,
                           pending_appointments=pending_appointments)
 
+def _report_range():
+    # Inclusive date range from ?start=&end=, defaulting to the last 30 days
+    today = datetime.now().date()
+    try:
+        end = datetime.strptime(request.args.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        end = today
+    try:
+        start = datetime.strptime(request.args.get('start', ''), '%Y-%m-%d').date()
+    except ValueError:
+        start = end - timedelta(days=29)
+    if start > end:
+        abort(400)
+    return start, end
+
+@app.route('/admin/reports')
+@login_required
+def admin_reports():
+    if not current_user.is_admin:
+        abort(403)  # Forbidden
+    
+    start, end = _report_range()
+    reports = {name: run_report(name, start, end) for name in REPORTS}
+    return render_template('admin/reports.html', title='Reports', reports=reports, start=start, end=end)
+
+@app.route('/admin/reports/<report>.csv')
+@login_required
+def export_report(report):
+    if not current_user.is_admin:
+        abort(403)  # Forbidden
+    if report not in REPORTS:
+        abort(404)
+    
+    start, end = _report_range()
+    rows = run_report(report, start, end)
+    output = io.StringIO()
+    if rows:
+        writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    filename = f'{report}_{start}_{end}.csv'
+    return Response(output.getvalue(), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
 @app.route('/admin/doctors', methods=['GET'])
 @login_required
 def manage_doctors():
@@ -208,7 +403,10 @@ def edit_doctor(doctor_id):
         doctor.qualification = form.qualification.data
         doctor.availability = form.availability.data
         
+        changes = audit.changes(doctor)
         db.session.commit()
+        if changes:
+            audit.record('doctor.updated', 'doctor', doctor.id, changes)
         flash('Doctor information has been updated!', 'success')
         return redirect(url_for('manage_doctors'))
     
@@ -233,16 +431,34 @@ def delete_doctor(doctor_id):
     doctor = Doctor.query.get_or_404(doctor_id)
     
     # Check if doctor has any appointments
-    appointments = Appointment.query.filter_by(doctor_id=doctor_id).first()
+    appointments = Appointment.query.filter_by(doctor_id=doctor_id).first() or \
+        ArchivedAppointment.query.filter_by(doctor_id=doctor_id).first()
     if appointments:
         flash('Cannot delete doctor with existing appointments.', 'danger')
         return redirect(url_for('manage_doctors'))
     
+    deleted = {'name': doctor.name, 'email': doctor.email, 'license_number': doctor.license_number}
     db.session.delete(doctor)
     db.session.commit()
+    audit.record('doctor.deleted', 'doctor', doctor_id, deleted)
     flash('Doctor has been deleted!', 'success')
     return redirect(url_for('manage_doctors'))
 
+# Audit trail of one appointment, doctor or user
+@app.route('/admin/audit/<entity_type>/<int:entity_id>')
+@login_required
+def audit_history(entity_type, entity_id):
+    if not current_user.is_admin:
+        abort(403)  # Forbidden
+    
+    return jsonify([{
+        'occurred_at': event['occurred_at'].isoformat(),
+        'actor': event['actor'],
+        'action': event['action'],
+        'details': json.loads(event['details']) if event['details'] else None,
+        'ip_address': event['ip_address'],
+    } for event in audit.history(entity_type, entity_id)])
+
 # Error handlers
 @app.errorhandler(404)
 def not_found_error(error):
@@ -353,6 +569,7 @@ def doctor_login():
         doctor = Doctor.query.filter_by(email=form.email.data).first()
         if doctor and doctor.check_password(form.password.data):
             login_user(doctor, remember=form.remember.data)
+            _issue_calendar_token(doctor)
             next_page = request.args.get('next')
             flash('Login successful!', 'success')
             return redirect(next_page) if next_page else redirect(url_for('doctor_dashboard'))
@@ -387,10 +604,18 @@ def doctor_register():
         doctor.set_password(form.password.data)
         
         db.session.add(doctor)
-        db.session.commit()
-        
-        flash('Registration successful! You can now login with your credentials.', 'success')
-        return redirect(url_for('doctor_login'))
+        try:
+            db.session.commit()
+        except IntegrityError as error:
+            db.session.rollback()
+            if not _unique_field_error(form, error, 'doctor', {
+                'email': 'Email is already registered. Please use a different one.',
+                'license_number': 'License number is already registered.',
+            }):
+                raise
+        else:
+            flash('Registration successful! You can now login with your credentials.', 'success')
+            return redirect(url_for('doctor_login'))
     
     return render_template('doctor/register.html', title='Doctor Registration', form=form)
 
@@ -451,20 +676,25 @@ def doctor_appointments():
     
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', 'all')
+    show_history = request.args.get('history', type=int) == 1
     
-    query = Appointment.query.filter_by(doctor_id=current_user.id)
+    # Archived (older finished) appointments are paged separately from the hot table
+    model = ArchivedAppointment if show_history else Appointment
+    query = model.query.filter_by(doctor_id=current_user.id)
     
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
-    appointments = query.order_by(Appointment.date.desc(), Appointment.time.desc()).paginate(
+    appointments = query.order_by(model.date.desc(), model.time.desc()).paginate(
         page=page, per_page=10, error_out=False
     )
     
     return render_template('doctor/appointments.html',
                          title='My Appointments',
                          appointments=appointments,
-                         status_filter=status_filter)
+                         status_filter=status_filter,
+                         show_history=show_history,
+                         bulk_form=BulkAppointmentForm())
 
 
 @app.route('/doctor/appointment/<int:appointment_id>')
@@ -483,6 +713,17 @@ def doctor_appointment_detail(appointment_id):
                          appointment=appointment)
 
 
+def _slot_taken(appointment):
+    # Read the primary: the replica may not have the refill yet
+    db.session.info['pin_primary'] = True
+    return db.session.query(exists().where(
+        Appointment.doctor_id == appointment.doctor_id,
+        Appointment.date == appointment.date,
+        Appointment.time == appointment.time,
+        Appointment.status != 'Cancelled',
+        Appointment.id != appointment.id,
+    )).scalar()
+
 @app.route('/doctor/appointment/<int:appointment_id>/update', methods=['GET', 'POST'])
 @login_required
 def doctor_update_appointment(appointment_id):
@@ -497,16 +738,31 @@ def doctor_update_appointment(appointment_id):
     form = AppointmentStatusForm()
     
     if form.validate_on_submit():
-        appointment.status = form.status.data
-        if hasattr(appointment, 'notes'):
-            appointment.notes = form.notes.data
+        # A cancelled slot may since have gone to another patient (e.g. from the waitlist)
+        if appointment.status == 'Cancelled' and form.status.data != 'Cancelled' and _slot_taken(appointment):
+            flash('This slot has been booked by another patient since it was cancelled, so it cannot be reopened.', 'danger')
         else:
-            # Add notes column if it doesn't exist
-            pass
+            appointment.status = form.status.data
+            if hasattr(appointment, 'notes'):
+                appointment.notes = form.notes.data
+            else:
+                # Add notes column if it doesn't exist
+                pass
         
-        db.session.commit()
-        flash('Appointment status updated successfully!', 'success')
-        return redirect(url_for('doctor_appointment_detail', appointment_id=appointment.id))
+            changes = audit.changes(appointment)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Reopening a cancelled appointment the patient has since replaced with another booking
+                db.session.rollback()
+                flash('The patient already has another appointment at that time, so this one cannot be reopened.', 'danger')
+            else:
+                if changes:
+                    audit.record('appointment.updated', 'appointment', appointment.id, changes)
+                appointments_changed.send('doctor_update_appointment', doctor_id=current_user.id,
+                                          status=appointment.status, count=1)
+                flash('Appointment status updated successfully!', 'success')
+                return redirect(url_for('doctor_appointment_detail', appointment_id=appointment.id))
     
     # Pre-populate form
     if request.method == 'GET':
@@ -520,6 +776,68 @@ def doctor_update_appointment(appointment_id):
                          form=form)
 
 
+@app.route('/doctor/appointments/bulk', methods=['POST'])
+@login_required
+def doctor_bulk_update_appointments():
+    if not isinstance(current_user, Doctor):
+        abort(403)
+    
+    form = BulkAppointmentForm()
+    if not form.validate_on_submit():
+        flash('Invalid bulk action.', 'danger')
+        return redirect(url_for('doctor_appointments'))
+    
+    # Ownership is part of the WHERE clause, so each action is a single UPDATE
+    query = Appointment.query.filter(Appointment.doctor_id == current_user.id)
+    open_statuses = ('Pending', 'Confirmed')
+    
+    if form.action.data == 'confirm_pending':
+        if not form.date.data:
+            flash('Please choose a date to confirm.', 'danger')
+            return redirect(url_for('doctor_appointments'))
+        query = query.filter(Appointment.date == form.date.data, Appointment.status == 'Pending')
+        new_status = 'Confirmed'
+    elif form.action.data == 'complete_selected':
+        selected = request.form.getlist('appointment_ids', type=int)
+        if not selected:
+            flash('Please select at least one appointment.', 'danger')
+            return redirect(url_for('doctor_appointments'))
+        query = query.filter(Appointment.id.in_(selected), Appointment.status.in_(open_statuses))
+        new_status = 'Completed'
+    else:
+        start = form.date.data
+        end = form.end_date.data or start
+        if not start or end < start:
+            flash('Please choose a valid date range to cancel.', 'danger')
+            return redirect(url_for('doctor_appointments'))
+        query = query.filter(Appointment.date.between(start, end), Appointment.status.in_(open_statuses))
+        new_status = 'Cancelled'
+    
+    # The redirect must read this write back, so keep the user on the primary
+    db.session.info['pin_primary'] = True
+    statement = update(Appointment).where(query.whereclause).values(status=new_status)
+    if db.session.get_bind().dialect.update_returning:
+        ids = db.session.execute(statement.returning(Appointment.id),
+                                 execution_options={'synchronize_session': False}).scalars().all()
+    else:
+        # No UPDATE ... RETURNING (MySQL): collect the ids first, then update exactly those
+        ids = db.session.execute(select(Appointment.id).where(query.whereclause)).scalars().all()
+        db.session.execute(update(Appointment).where(Appointment.id.in_(ids)).values(status=new_status),
+                           execution_options={'synchronize_session': False})
+    db.session.commit()
+    count = len(ids)
+    
+    # One event per row, so each appointment's history shows the change
+    for appointment_id in ids:
+        audit.record('appointment.updated', 'appointment', appointment_id,
+                     {'status': new_status, 'bulk_action': form.action.data})
+    if count:
+        appointments_changed.send('doctor_bulk_update_appointments',
+                                  doctor_id=current_user.id, status=new_status, count=count)
+    flash(f'{count} appointment(s) marked as {new_status}.', 'success' if count else 'info')
+    return redirect(url_for('doctor_appointments'))
+
+
 @app.route('/doctor/profile')
 @login_required
 def doctor_profile():
@@ -598,4 +916,81 @@ def doctor_schedule():
     return render_template('doctor/schedule.html',
                          title='Weekly Schedule',
                          schedule=schedule,
-                         today=today)
+                         today=today,
+                         timedelta=timedelta,
+                         calendar_url=_calendar_url(current_user, 'doctor'))
+
+
+# Calendar feeds (iCal subscription URLs authenticated by a secret token)
+CALENDAR_OWNERS = {
+    'doctor': (Doctor, Appointment.doctor_id),
+    'patient': (User, Appointment.user_id),
+}
+
+def _calendar_url(owner, kind):
+    # Tokens are issued when the account is created (or, for older accounts, at login)
+    if not owner.calendar_token:
+        return None
+    return url_for('calendar_feed', kind=kind, token=owner.calendar_token, _external=True)
+
+def _issue_calendar_token(owner):
+    # Accounts created before calendar feeds existed get their token on next login
+    if not owner.calendar_token:
+        owner.calendar_token = new_calendar_token()
+        db.session.commit()
+
+def _calendar_owner(kind, token):
+    if kind not in CALENDAR_OWNERS:
+        abort(404)
+    model, column = CALENDAR_OWNERS[kind]
+    owner = model.query.filter_by(calendar_token=token).first_or_404()
+    return owner, column
+
+def _changes_payload(kind, appointments, next_token, more):
+    describe = _describe_for(kind)
+    return {
+        'sync_token': next_token,
+        'more': more,
+        'changes': [{
+            'id': a.id,
+            'date': a.date.isoformat(),
+            'time': a.time,
+            'status': a.status,
+            'summary': describe(a)[0],
+            'updated_at': a.updated_at.isoformat(),
+        } for a in appointments],
+    }
+
+def _describe_for(kind):
+    if kind == 'doctor':
+        return lambda a: (f'Appointment: {a.patient.username}', a.symptoms)
+    return lambda a: (f'Dr. {a.doctor.name} ({a.doctor.specialty})', a.doctor.address or '')
+
+@app.route('/calendar/<kind>/<token>.ics')
+def calendar_feed(kind, token):
+    owner, column = _calendar_owner(kind, token)
+    
+    # Answer polling clients from one aggregate query when nothing changed
+    etag, last_modified = ical.feed_version(column, owner.id)
+    if etag in request.if_none_match or (
+            last_modified and request.if_modified_since and not request.if_none_match
+            and last_modified.replace(microsecond=0) <= request.if_modified_since):
+        response = Response(status=304)
+    else:
+        appointments = ical.feed_query(column, owner.id).order_by(Appointment.date, Appointment.time).all()
+        name = f'Medicare+ - {owner.name if kind == "doctor" else owner.username}'
+        response = Response(ical.render_calendar(name, appointments, _describe_for(kind)),
+                            mimetype='text/calendar')
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/calendar/<kind>/<token>/changes')
+def calendar_changes(kind, token):
+    owner, column = _calendar_owner(kind, token)
+    result = ical.changes_since(column, owner.id, request.args.get('since'))
+    if result is None:
+        abort(400)
+    return jsonify(_changes_payload(kind, *result))
@@ -0,0 +1,8 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent once per write that changes appointments, however many rows it touched.
+# Receivers get the sender name plus doctor_id, status and count keyword args.
+# Connected in reports.py, which drops its cached report results.
+appointments_changed = _signals.signal('appointments-changed')
@@ -0,0 +1,41 @@
+// Suggest specialists for the typed symptoms, debounced to one request per pause
+(function() {
+    const symptoms = document.getElementById('symptoms');
+    const box = document.getElementById('symptom-suggestions');
+    if (!symptoms || !box) return;
+    let timer = null;
+    
+    symptoms.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            const text = symptoms.value.trim();
+            if (text.length < 3) {
+                box.classList.add('d-none');
+                return;
+            }
+            fetch(box.dataset.recommendUrl + '?symptoms=' + encodeURIComponent(text))
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.specialties.length) {
+                        box.classList.add('d-none');
+                        return;
+                    }
+                    box.textContent = '';
+                    const icon = document.createElement('i');
+                    icon.className = 'fas fa-lightbulb';
+                    box.appendChild(icon);
+                    box.appendChild(document.createTextNode(' Suggested: ' +
+                        data.specialties.map(item => item.specialty).join(', ') + '. '));
+                    data.doctors.forEach(function(doctor) {
+                        const link = document.createElement('a');
+                        link.href = box.dataset.bookUrl.replace(/0$/, doctor.id);
+                        link.textContent = doctor.name + ' (' + doctor.specialty + ')';
+                        box.appendChild(link);
+                        box.appendChild(document.createTextNode(' '));
+                    });
+                    box.classList.remove('d-none');
+                })
+                .catch(() => box.classList.add('d-none'));
+        }, 300);
+    });
+})();
@@ -0,0 +1,69 @@
+// Replies can quote user-supplied text (doctor names, the message itself), so
+// it is always inserted as text, never parsed as HTML
+function appendMessage(container, className, label, text) {
+    const message = document.createElement('div');
+    message.className = className;
+    const strong = document.createElement('strong');
+    strong.textContent = label;
+    message.appendChild(strong);
+    message.appendChild(document.createTextNode(' ' + text));
+    container.appendChild(message);
+    return message;
+}
+
+document.getElementById('chat-form').addEventListener('submit', function(e) {
+    e.preventDefault();
+    
+    const messageInput = document.getElementById('message');
+    const message = messageInput.value.trim();
+    
+    if (!message) return;
+    
+    const chatMessages = document.getElementById('chat-messages');
+    
+    // Add user message
+    appendMessage(chatMessages, 'alert alert-primary text-end mb-2', 'You:', message);
+    
+    // Clear input
+    messageInput.value = '';
+    
+    // Show loading
+    const loadingMessage = document.createElement('div');
+    loadingMessage.className = 'alert alert-secondary mb-2';
+    loadingMessage.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Assistant is thinking...';
+    chatMessages.appendChild(loadingMessage);
+    
+    // Scroll to bottom
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+    
+    // Send AJAX request
+    fetch('/api/chat', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            'message': message
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        // Remove loading message
+        chatMessages.removeChild(loadingMessage);
+        
+        // Add bot response
+        appendMessage(chatMessages, 'alert alert-success mb-2', 'Assistant:', data.response);
+        
+        // Scroll to bottom
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        chatMessages.removeChild(loadingMessage);
+        
+        const errorMessage = document.createElement('div');
+        errorMessage.className = 'alert alert-danger mb-2';
+        errorMessage.innerHTML = '<strong>Error:</strong> Something went wrong. Please try again.';
+        chatMessages.appendChild(errorMessage);
+    });
+});
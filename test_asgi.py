@@ -0,0 +1,25 @@
+"""
+Tests for the ASGI entry point's JSON endpoints
+"""
+import pytest
+
+pytest.importorskip('httpx')
+pytest.importorskip('aiosqlite')
+
+from starlette.testclient import TestClient
+
+import asgi
+
+pytestmark = pytest.mark.usefixtures('fresh_db')
+
+
+@pytest.mark.parametrize('body', [[], 'fever', 3, {'message': ['fever']}])
+def test_chat_rejects_body_that_is_not_an_object_with_a_message(body):
+    response = TestClient(asgi.application).post('/api/chat', json=body)
+    assert response.status_code == 400
+
+
+def test_chat_answers_a_message():
+    response = TestClient(asgi.application).post('/api/chat', json={'message': 'fever and cough'})
+    assert response.status_code == 200
+    assert set(response.json()) == {'response', 'recommendations'}
@@ -0,0 +1,48 @@
+"""
+Tests for doctors' bulk appointment actions
+"""
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+from app import app, db
+from db_routing import PRIMARY_PIN_KEY
+from models import User, Doctor, Appointment
+
+DAY = date.today() + timedelta(days=30)
+
+pytestmark = pytest.mark.usefixtures('fresh_db')
+
+
+def test_bulk_confirm_pins_doctor_to_primary():
+    with app.app_context():
+        tag = uuid.uuid4().hex[:10]
+        patient = User(username=f'bk_{tag}', email=f'bk_{tag}@test.com')
+        patient.set_password('testpass123')
+        doctor = Doctor(name=f'Bulk {tag}', email=f'bk_{tag}@doctor.com', specialty='General Medicine',
+                        price=500, experience=3, qualification='MBBS', availability='Mon-Fri',
+                        phone='9999999999', address='Test Address', license_number=f'BK{tag}')
+        doctor.set_password('testpass123')
+        db.session.add_all([patient, doctor])
+        db.session.flush()
+        appointment = Appointment(user_id=patient.id, doctor_id=doctor.id, date=DAY, time='10:00 AM',
+                                  status='Pending')
+        db.session.add(appointment)
+        db.session.commit()
+        appointment_id, doctor_id = appointment.id, doctor.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = f'doctor_{doctor_id}'
+        session['_fresh'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        client.post('/doctor/appointments/bulk', data={'action': 'confirm_pending', 'date': DAY.isoformat()})
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+    with client.session_transaction() as session:
+        assert PRIMARY_PIN_KEY in session
+    with app.app_context():
+        assert db.session.get(Appointment, appointment_id).status == 'Confirmed'
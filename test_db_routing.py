@@ -0,0 +1,74 @@
+"""
+Tests for read-replica routing: plain SELECTs go to a replica, reads after a write stay on the primary
+"""
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, update
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from db_routing import RoutingSession, copy_primary_to_replicas, create_replica_tables, replica_binds
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Note(Base):
+    __tablename__ = 'note'
+    id: Mapped[int] = mapped_column(primary_key=True)
+    text: Mapped[str]
+
+
+def _routed_app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path / "primary.db"}'
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(f'sqlite:///{tmp_path / "replica.db"}')
+    db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        create_replica_tables(db)
+    return app, db
+
+
+def test_select_reads_replica_and_read_after_write_uses_primary(tmp_path):
+    app, db = _routed_app(tmp_path)
+    with app.app_context():
+        # Only the primary has the row, so where a read lands shows in its result
+        with db.engines[None].begin() as connection:
+            connection.execute(Note.__table__.insert(), {'text': 'primary only'})
+
+        assert db.session.scalars(select(Note)).all() == []
+
+        db.session.add(Note(text='written'))
+        db.session.flush()
+        assert {note.text for note in db.session.scalars(select(Note))} == {'primary only', 'written'}
+        db.session.commit()
+        db.session.remove()
+
+        assert db.session.scalars(select(Note)).all() == []
+
+
+def test_seeding_copies_primary_into_replica(tmp_path):
+    app, db = _routed_app(tmp_path)
+    with app.app_context():
+        db.session.add(Note(text='seeded'))
+        db.session.commit()
+        db.session.remove()
+
+        assert copy_primary_to_replicas(db) == ['replica_0']
+        assert [note.text for note in db.session.scalars(select(Note))] == ['seeded']
+
+
+def test_reads_after_unflushed_dml_use_primary(tmp_path):
+    app, db = _routed_app(tmp_path)
+    with app.app_context():
+        db.session.add(Note(text='before'))
+        db.session.commit()
+        db.session.remove()
+
+        # An UPDATE statement writes without a flush; what follows must still see it
+        db.session.execute(update(Note).values(text='after'))
+        assert db.session.info['pin_primary'] is True
+        assert [note.text for note in db.session.scalars(select(Note))] == ['after']
+        db.session.commit()
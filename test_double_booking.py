@@ -0,0 +1,61 @@
+"""
+Tests for the patient double-booking guard
+"""
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+from app import app, db
+from models import User, Doctor, Appointment
+
+DAY = date.today() + timedelta(days=75)
+
+pytestmark = pytest.mark.usefixtures('fresh_db')
+
+
+def _user():
+    tag = uuid.uuid4().hex[:10]
+    user = User(username=f'db_{tag}', email=f'db_{tag}@test.com')
+    user.set_password('testpass123')
+    db.session.add(user)
+    return user
+
+
+def _doctor():
+    tag = uuid.uuid4().hex[:10]
+    doctor = Doctor(name=f'Overlap {tag}', email=f'db_{tag}@doctor.com', specialty='General Medicine',
+                    price=500, experience=3, qualification='MBBS', availability='Mon-Fri',
+                    phone='9999999999', address='Test Address', license_number=f'DB{tag}')
+    doctor.set_password('testpass123')
+    db.session.add(doctor)
+    return doctor
+
+
+def test_reopening_replaced_appointment_is_refused():
+    with app.app_context():
+        patient, first_doctor, second_doctor = _user(), _doctor(), _doctor()
+        db.session.flush()
+        cancelled = Appointment(user_id=patient.id, doctor_id=first_doctor.id, date=DAY, time='10:00 AM',
+                                status='Cancelled')
+        replacement = Appointment(user_id=patient.id, doctor_id=second_doctor.id, date=DAY, time='10:00 AM',
+                                  status='Confirmed')
+        db.session.add_all([cancelled, replacement])
+        db.session.commit()
+        appointment_id, doctor_id = cancelled.id, first_doctor.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = f'doctor_{doctor_id}'
+        session['_fresh'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        response = client.post(f'/doctor/appointment/{appointment_id}/update',
+                               data={'status': 'Confirmed', 'notes': ''})
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+    assert response.status_code == 200
+    assert b'cannot be reopened' in response.data
+    with app.app_context():
+        assert db.session.get(Appointment, appointment_id).status == 'Cancelled'
@@ -0,0 +1,66 @@
+"""
+Tests for calendar tokens and delta sync
+"""
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app import app, db
+from models import User, Doctor, Appointment
+import ical
+
+pytestmark = pytest.mark.usefixtures('fresh_db')
+
+
+def _user():
+    tag = uuid.uuid4().hex[:10]
+    user = User(username=f'ic_{tag}', email=f'ic_{tag}@test.com')
+    user.set_password('testpass123')
+    db.session.add(user)
+    return user
+
+
+def _doctor():
+    tag = uuid.uuid4().hex[:10]
+    doctor = Doctor(name=f'Calendar {tag}', email=f'ic_{tag}@doctor.com', specialty='General Medicine',
+                    price=500, experience=3, qualification='MBBS', availability='Mon-Fri',
+                    phone='9999999999', address='Test Address', license_number=f'IC{tag}')
+    doctor.set_password('testpass123')
+    db.session.add(doctor)
+    return doctor
+
+
+def test_accounts_get_a_calendar_token_when_created():
+    with app.app_context():
+        user, doctor = _user(), _doctor()
+        db.session.commit()
+        assert user.calendar_token and doctor.calendar_token
+        assert user.calendar_token != doctor.calendar_token
+
+
+def test_sync_token_never_passes_unsettled_changes():
+    with app.app_context():
+        user, doctor = _user(), _doctor()
+        db.session.flush()
+        settled = Appointment(user_id=user.id, doctor_id=doctor.id, date=date.today() + timedelta(days=90),
+                              time='10:00 AM', status='Confirmed')
+        fresh = Appointment(user_id=user.id, doctor_id=doctor.id, date=date.today() + timedelta(days=91),
+                            time='10:00 AM', status='Pending')
+        db.session.add_all([settled, fresh])
+        db.session.flush()
+        # updated_at is stamped at flush; backdate one row past the settle window
+        settled.updated_at = datetime.utcnow() - timedelta(seconds=app.config['CALENDAR_SYNC_SETTLE_SECONDS'] + 5)
+        db.session.commit()
+
+        rows, token, more = ical.changes_since(Appointment.doctor_id, doctor.id, '0')
+        assert [row.id for row in rows] == [settled.id] and not more
+
+        # A change stamped before `fresh` but committed later is still ahead of the token
+        assert fresh.updated_at > ical.decode_sync_token(token)
+
+
+def test_sync_token_round_trips_exact_microseconds():
+    # The second value comes out a microsecond short through a float timestamp
+    for value in (datetime(2026, 10, 19, 14, 38, 51, 999999), datetime(2038, 2, 17, 13, 10, 34, 182204)):
+        assert ical.decode_sync_token(ical.encode_sync_token(value)) == value
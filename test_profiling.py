@@ -0,0 +1,23 @@
+"""
+Tests for the background stack sampler
+"""
+import time
+
+from profiling import SamplingProfiler
+
+
+def test_restart_right_after_stop_keeps_sampling():
+    sampler = SamplingProfiler(interval=0.001, max_overhead=1.0)
+    sampler.start()
+    time.sleep(0.01)
+    sampler.stop()
+    assert not sampler.running
+
+    sampler.start()
+    try:
+        assert sampler.running
+        samples = sampler.samples
+        time.sleep(0.05)
+        assert sampler.samples > samples
+    finally:
+        sampler.stop()
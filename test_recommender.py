@@ -0,0 +1,66 @@
+"""
+Tests for the symptom recommender's stemming and index rebuilds
+"""
+import threading
+from types import SimpleNamespace
+
+from recommender import SymptomIndex, stem, tokenize
+
+
+def _doctor(doctor_id, name, specialty, description=''):
+    return SimpleNamespace(id=doctor_id, name=name, specialty=specialty, description=description,
+                           price=500, is_active=True)
+
+
+def test_word_forms_share_a_stem():
+    for forms in (('headache', 'headaches'), ('dizzy', 'dizziness'), ('itching', 'itchy', 'itch'),
+                  ('rash', 'rashes'), ('allergy', 'allergies'), ('sneeze', 'sneezing'), ('eye', 'eyes')):
+        assert len({stem(form) for form in forms}) == 1, forms
+
+
+def test_tokenize_drops_stopwords_and_short_words():
+    assert tokenize('I have a headache') == [stem('headache')]
+
+
+def test_plural_and_adjective_forms_find_specialty():
+    result = SymptomIndex().recommend('I have headaches and feel dizzy')
+    assert result['specialties'][0]['specialty'] == 'Neurologist'
+
+
+def test_rebuild_swaps_doctor_set():
+    index = SymptomIndex()
+    index.rebuild([_doctor(1, 'Dr. Heart', 'Cardiology')])
+    index.rebuild([_doctor(2, 'Dr. Skin', 'Dermatology')])
+    assert [d['id'] for d in index.recommend('itchy skin rash')['doctors']] == [2]
+    assert index.recommend('chest pain palpitations')['doctors'] == []
+
+
+def test_rebuild_keeps_serving_and_replays_concurrent_changes():
+    index = SymptomIndex()
+    index.rebuild([_doctor(1, 'Dr. Heart', 'Cardiology')])
+    started, release = threading.Event(), threading.Event()
+
+    def slow_doctors():
+        yield _doctor(1, 'Dr. Heart', 'Cardiology')
+        started.set()
+        release.wait(5)
+
+    rebuild = threading.Thread(target=index.rebuild, args=(slow_doctors(),))
+    rebuild.start()
+    started.wait(5)
+    # Mid-rebuild: queries still see the old doctors, and a committed change lands
+    assert [d['id'] for d in index.recommend('chest pain')['doctors']] == [1]
+    index.update_doctor(_doctor(3, 'Dr. Lung', 'Pulmonology'))
+    release.set()
+    rebuild.join(5)
+
+    assert [d['id'] for d in index.recommend('wheezing asthma')['doctors']] == [3]
+
+
+def test_description_match_ranks_first_among_many_specialty_peers():
+    index = SymptomIndex()
+    peers = [_doctor(i, f'Dr. {i}', 'Neurology', 'General neurology clinic') for i in range(1, 2000)]
+    index.rebuild(peers + [_doctor(5000, 'Dr. Migraine', 'Neurology', 'Migraine and headache specialist')])
+    result = index.recommend('severe migraine headaches')
+    assert result['doctors'][0]['id'] == 5000
+    assert len(result['doctors']) == 3
@@ -0,0 +1,55 @@
+"""
+Tests for registration's first-user admin grant under concurrent sign-ups
+"""
+import uuid
+
+import pytest
+import sqlalchemy
+
+from app import app, db
+from models import User, AdminBootstrap
+import routes
+
+pytestmark = pytest.mark.usefixtures('fresh_db')
+
+
+def _register():
+    tag = uuid.uuid4().hex[:10]
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        response = app.test_client().post('/register', data={
+            'username': f'rg_{tag}', 'email': f'rg_{tag}@test.com',
+            'password': 'testpass123', 'confirm_password': 'testpass123',
+        })
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+    assert response.status_code == 302
+    with app.app_context():
+        return User.query.filter_by(username=f'rg_{tag}').one()
+
+
+def test_first_signup_becomes_admin_and_claims_bootstrap_row():
+    first, second = _register(), _register()
+    assert first.is_admin is True and second.is_admin is False
+    with app.app_context():
+        assert db.session.get(AdminBootstrap, 1).user_id == first.id
+
+
+def test_losing_first_signup_race_registers_regular_user(monkeypatch):
+    winner = _register()
+    # Every sign-up sees an empty user table, as both racers of a first sign-up would
+    monkeypatch.setattr(routes, 'exists', lambda: sqlalchemy.exists().where(sqlalchemy.false()))
+
+    loser = _register()
+    assert winner.is_admin is True and loser.is_admin is False
+
+
+def test_further_admins_can_be_granted():
+    _register()
+    with app.app_context():
+        tag = uuid.uuid4().hex[:10]
+        user = User(username=f'ad_{tag}', email=f'ad_{tag}@test.com', is_admin=True)
+        user.set_password('testpass123')
+        db.session.add(user)
+        db.session.commit()
+        assert User.query.filter_by(is_admin=True).count() == 2
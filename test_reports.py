@@ -0,0 +1,56 @@
+"""
+Tests for the closed-period report cache
+"""
+import uuid
+from datetime import date
+
+import pytest
+
+from app import app, db
+from models import User, Doctor, Appointment
+from reports import run_report
+from signals import appointments_changed
+
+DAY = date(2001, 3, 14)
+
+pytestmark = pytest.mark.usefixtures('fresh_db')
+
+
+def _appointment():
+    tag = uuid.uuid4().hex[:10]
+    user = User(username=f'rp_{tag}', email=f'rp_{tag}@test.com')
+    user.set_password('testpass123')
+    doctor = Doctor(name=f'Reports {tag}', email=f'rp_{tag}@doctor.com', specialty='General Medicine',
+                    price=500, experience=3, qualification='MBBS', availability='Mon-Fri',
+                    phone='9999999999', address='Test Address', license_number=f'RP{tag}')
+    doctor.set_password('testpass123')
+    db.session.add_all([user, doctor])
+    db.session.flush()
+    appointment = Appointment(user_id=user.id, doctor_id=doctor.id, date=DAY, time='10:00 AM',
+                              symptoms='checkup', status='Confirmed')
+    db.session.add(appointment)
+    db.session.commit()
+    return appointment
+
+
+def _cancelled_on_day():
+    return sum(row['cancelled'] for row in run_report('daily', DAY, DAY))
+
+
+def test_closed_period_is_cached_until_its_appointments_change():
+    with app.app_context():
+        appointment = _appointment()
+        assert _cancelled_on_day() == 0
+        assert run_report('daily', DAY, DAY) is run_report('daily', DAY, DAY)
+
+        appointment.status = 'Cancelled'
+        db.session.commit()
+        assert _cancelled_on_day() == 1
+
+
+def test_appointment_change_signal_drops_cached_reports():
+    with app.app_context():
+        _appointment()
+        cached = run_report('daily', DAY, DAY)
+        appointments_changed.send('test', doctor_id=None, status='Cancelled', count=1)
+        assert run_report('daily', DAY, DAY) is not cached
@@ -0,0 +1,179 @@
+"""
+Tests for waitlist slot refill: claim-once, skip-self, rollback invalidation and refused refills
+"""
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+from app import app, db
+from models import User, Doctor, Appointment, WaitlistEntry
+import waitlist
+
+DAY = date.today() + timedelta(days=60)
+
+pytestmark = pytest.mark.usefixtures('fresh_db')
+
+
+def _user():
+    tag = uuid.uuid4().hex[:10]
+    user = User(username=f'wl_{tag}', email=f'wl_{tag}@test.com')
+    user.set_password('testpass123')
+    db.session.add(user)
+    return user
+
+
+def _doctor():
+    tag = uuid.uuid4().hex[:10]
+    doctor = Doctor(name=f'Waitlist {tag}', email=f'wl_{tag}@doctor.com', specialty='General Medicine',
+                    price=500, experience=3, qualification='MBBS', availability='Mon-Fri',
+                    phone='9999999999', address='Test Address', license_number=f'WL{tag}')
+    doctor.set_password('testpass123')
+    db.session.add(doctor)
+    return doctor
+
+
+def _booked_slot(doctor, patient, time='10:00 AM'):
+    appointment = Appointment(user_id=patient.id, doctor_id=doctor.id, date=DAY, time=time,
+                              symptoms='checkup', status='Confirmed')
+    db.session.add(appointment)
+    return appointment
+
+
+def _wait(doctor, patient, priority=0):
+    entry = WaitlistEntry(user_id=patient.id, doctor_id=doctor.id, start_date=DAY, end_date=DAY,
+                          symptoms='waiting', priority=priority)
+    db.session.add(entry)
+    return entry
+
+
+def _cancel(appointment):
+    appointment.status = 'Cancelled'
+    return waitlist.fill_slot(appointment)
+
+
+def test_waiter_is_claimed_once():
+    with app.app_context():
+        doctor, patient, first, second = _doctor(), _user(), _user(), _user()
+        db.session.flush()
+        slot = _booked_slot(doctor, patient)
+        other_slot = _booked_slot(doctor, patient, time='11:00 AM')
+        first_entry = _wait(doctor, first, priority=0)
+        _wait(doctor, second, priority=1)
+        db.session.commit()
+
+        booked = _cancel(slot)
+        db.session.commit()
+        assert booked.user_id == first.id
+        assert db.session.get(WaitlistEntry, first_entry.id).status == 'Booked'
+
+        # A stale heap (e.g. in another worker) still holding the claimed entry
+        waitlist.queues.push(doctor.id, DAY, (first_entry.priority, first_entry.created_at, first_entry.id))
+        booked = _cancel(other_slot)
+        db.session.commit()
+        assert booked.user_id == second.id
+
+
+def test_cancelling_patient_is_skipped_and_keeps_waiting():
+    with app.app_context():
+        doctor, patient, other = _doctor(), _user(), _user()
+        db.session.flush()
+        slot = _booked_slot(doctor, patient)
+        own_entry = _wait(doctor, patient, priority=0)
+        _wait(doctor, other, priority=5)
+        db.session.commit()
+
+        booked = _cancel(slot)
+        db.session.commit()
+        assert booked.user_id == other.id
+        assert db.session.get(WaitlistEntry, own_entry.id).status == 'Waiting'
+
+
+def test_rollback_leaves_waiter_queued():
+    with app.app_context():
+        doctor, patient, waiter = _doctor(), _user(), _user()
+        db.session.flush()
+        slot = _booked_slot(doctor, patient)
+        entry = _wait(doctor, waiter)
+        db.session.commit()
+
+        assert _cancel(slot).user_id == waiter.id
+        db.session.rollback()
+        assert db.session.get(WaitlistEntry, entry.id).status == 'Waiting'
+
+        # The popped entry is served again once the heaps are rebuilt
+        assert _cancel(slot).user_id == waiter.id
+        db.session.commit()
+
+
+def test_repeated_cancel_refills_once():
+    with app.app_context():
+        doctor, patient, first, second = _doctor(), _user(), _user(), _user()
+        db.session.flush()
+        slot = _booked_slot(doctor, patient)
+        _wait(doctor, first)
+        _wait(doctor, second)
+        db.session.commit()
+        slot_id, doctor_id, patient_id = slot.id, doctor.id, patient.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(patient_id)
+        session['_fresh'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        for _ in range(3):
+            client.post(f'/cancel_appointment/{slot_id}')
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+    with app.app_context():
+        refills = Appointment.query.filter(Appointment.doctor_id == doctor_id,
+                                           Appointment.status == 'Pending').count()
+        assert refills == 1
+
+
+def test_refill_refused_by_overlap_constraint_moves_to_next_waiter(monkeypatch):
+    with app.app_context():
+        doctor, other_doctor, patient, busy, free = _doctor(), _doctor(), _user(), _user(), _user()
+        db.session.flush()
+        slot = _booked_slot(doctor, patient)
+        _booked_slot(other_doctor, busy)
+        busy_entry = _wait(doctor, busy, priority=0)
+        _wait(doctor, free, priority=1)
+        db.session.commit()
+
+        # As if the busy waiter's other booking hadn't reached the replica yet
+        monkeypatch.setattr(Appointment, 'find_conflict', classmethod(lambda cls, *args, **kwargs: None))
+        booked = _cancel(slot)
+        db.session.commit()
+
+        assert booked.user_id == free.id
+        assert db.session.get(WaitlistEntry, busy_entry.id).status == 'Waiting'
+        assert db.session.get(Appointment, slot.id).status == 'Cancelled'
+
+
+def test_doctor_cannot_reopen_refilled_slot():
+    with app.app_context():
+        doctor, patient, waiter = _doctor(), _user(), _user()
+        db.session.flush()
+        slot = _booked_slot(doctor, patient)
+        _wait(doctor, waiter)
+        db.session.commit()
+        assert _cancel(slot).user_id == waiter.id
+        db.session.commit()
+        slot_id, doctor_id = slot.id, doctor.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = f'doctor_{doctor_id}'
+        session['_fresh'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    try:
+        response = client.post(f'/doctor/appointment/{slot_id}/update', data={'status': 'Confirmed', 'notes': ''})
+    finally:
+        app.config['WTF_CSRF_ENABLED'] = True
+
+    assert b'cannot be reopened' in response.data
+    with app.app_context():
+        assert db.session.get(Appointment, slot_id).status == 'Cancelled'
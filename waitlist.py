@@ -0,0 +1,151 @@
+import heapq
+import threading
+from datetime import date
+
+from sqlalchemy import event, func, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from db_routing import RoutingSession
+from models import Appointment, WaitlistEntry
+
+
+class WaitlistQueues:
+    """Per-(doctor, date) priority queues of waiting patients.
+
+    The table is the source of truth; each heap is loaded on first use and
+    holds (priority, created_at, entry id). Heaps for a doctor are dropped
+    whenever the doctor's newest entry id moves past what they were built
+    from, which picks up entries joined through other workers. Entries are
+    claimed with a conditional UPDATE, so a stale heap can never hand one
+    slot to two waiters.
+    """
+
+    def __init__(self):
+        self._heaps = {}         # (doctor_id, date) -> heap
+        self._built_upto = {}    # doctor_id -> newest entry id the heaps have seen
+        self._lock = threading.Lock()
+
+    def invalidate(self, doctor_id):
+        with self._lock:
+            self._built_upto.pop(doctor_id, None)
+            for key in [k for k in self._heaps if k[0] == doctor_id]:
+                del self._heaps[key]
+
+    def _heap(self, doctor_id, day):
+        newest = db.session.query(func.max(WaitlistEntry.id)).filter_by(doctor_id=doctor_id).scalar() or 0
+        if self._built_upto.get(doctor_id, 0) < newest:
+            self.invalidate(doctor_id)
+        with self._lock:
+            heap = self._heaps.get((doctor_id, day))
+        if heap is not None:
+            return heap
+
+        rows = db.session.query(WaitlistEntry.priority, WaitlistEntry.created_at, WaitlistEntry.id).filter(
+            WaitlistEntry.doctor_id == doctor_id,
+            WaitlistEntry.status == 'Waiting',
+            WaitlistEntry.start_date <= day,
+            WaitlistEntry.end_date >= day,
+        ).all()
+        heap = [tuple(row) for row in rows]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heaps[(doctor_id, day)] = heap
+            self._built_upto[doctor_id] = max(self._built_upto.get(doctor_id, 0), newest)
+        return heap
+
+    def pop(self, doctor_id, day):
+        heap = self._heap(doctor_id, day)
+        with self._lock:
+            return heapq.heappop(heap) if heap else None
+
+    def push(self, doctor_id, day, item):
+        with self._lock:
+            heap = self._heaps.get((doctor_id, day))
+            if heap is not None:
+                heapq.heappush(heap, item)
+
+
+queues = WaitlistQueues()
+
+
+def fill_slot(cancelled):
+    """Give a freed slot to the next eligible waiter.
+
+    Runs inside the caller's transaction: the new appointment and the claimed
+    entry are committed (or rolled back) together with the cancellation.
+    Returns the new appointment, or None when nobody is waiting.
+    """
+    doctor_id, day = cancelled.doctor_id, cancelled.date
+    if day < date.today():
+        return None
+    starts_at, ends_at = Appointment.slot_bounds(cancelled.date, cancelled.time)
+    db.session.info.setdefault('waitlist_touched', set()).add(doctor_id)
+
+    skipped = []
+    try:
+        while True:
+            item = queues.pop(doctor_id, day)
+            if item is None:
+                return None
+            entry = db.session.get(WaitlistEntry, item[2])
+            if entry is None:
+                continue
+            if entry.user_id == cancelled.user_id or Appointment.find_conflict(
+                    entry.user_id, starts_at, ends_at):
+                # Still waiting, just not for this slot: they gave it up
+                # themselves or are seeing another doctor at that time
+                skipped.append(item)
+                continue
+
+            try:
+                # A savepoint per attempt, so a refused booking only undoes itself
+                with db.session.begin_nested():
+                    # Claim the entry; rowcount 0 means another worker already served it
+                    claimed = db.session.execute(
+                        update(WaitlistEntry)
+                        .where(WaitlistEntry.id == entry.id, WaitlistEntry.status == 'Waiting')
+                        .values(status='Booked')
+                        .execution_options(synchronize_session=False)
+                    ).rowcount
+                    if not claimed:
+                        continue
+
+                    appointment = Appointment(
+                        user_id=entry.user_id,
+                        doctor_id=doctor_id,
+                        date=day,
+                        time=cancelled.time,
+                        symptoms=entry.symptoms,
+                        status='Pending',
+                    )
+                    db.session.add(appointment)
+                    db.session.flush()
+                    entry.appointment_id = appointment.id
+                    entry.status = 'Booked'
+            except IntegrityError:
+                # The waiter booked an overlapping slot that committed after
+                # find_conflict looked; the overlap constraint refused this one
+                skipped.append(item)
+                continue
+            return appointment
+    finally:
+        for item in skipped:
+            queues.push(doctor_id, day, item)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _drop_touched_queues(session):
+    # Entries popped in a rolled-back transaction are still waiting; reload them.
+    # A refill's savepoint ending is not the end of the transaction.
+    if session.in_nested_transaction():
+        return
+    for doctor_id in session.info.pop('waitlist_touched', ()):
+        queues.invalidate(doctor_id)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _forget_touched_queues(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop('waitlist_touched', None)